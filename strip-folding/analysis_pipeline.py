@@ -0,0 +1,326 @@
+from typing import List, Dict, Set, Optional, Tuple
+from database_tools import open_database, open_read_only_database, load_layers, load_states, load_order_states, \
+    split_layers, join_states
+from multiprocessing import Pool, Array
+from abc import ABC, abstractmethod
+import time
+
+
+# Columns of the strips table which are available to the analyzers
+STRIP_COLUMNS: Tuple[str, ...] = ('strip_name', 'layers', 'len', 'n_creases', 'M_creases', 'creases',
+                                  'crease_direction', 'n_orders', 'n_states', 'n_faces', 'crease_type',
+                                  'max_layer_depth')
+COLUMN_INDICES: Dict[str, int] = {column: index for index, column in enumerate(STRIP_COLUMNS)}
+
+
+class StripRow:
+    """
+    A row of the strips table shared by all analyzers of a scan.
+    The layers, states and orders are only decoded when an analyzer first asks for them, and at most once:
+    the layers of older rows are decoded from their layers column, from which the states and orders are split,
+    otherwise the states and the order graph are decoded and the layers are joined from them.
+    """
+    __slots__ = ('_connection', '_values', '_layers', '_states', '_order_states', '_orders', '_decode_time')
+
+    def __init__(self, connection, values: Tuple):
+        """
+        :param connection: connection to the SQLite database
+        :param values: values of STRIP_COLUMNS
+        """
+        self._connection = connection
+        self._values: Tuple = values
+        self._layers: Optional[Dict[str, Dict[str, str]]] = None
+        self._states: Optional[List[Dict[str, str]]] = None
+        self._order_states: Optional[Dict[str, int]] = None
+        self._orders: Optional[Set[str]] = None
+        self._decode_time: float = 0
+
+    def get(self, column: str):
+        """
+        Get the value of a column of STRIP_COLUMNS.
+
+        :param column: name of the column
+        :return: value of the column
+        """
+        return self._values[COLUMN_INDICES[column]]
+
+    def get_strip_name(self) -> str:
+        return self._values[0]
+
+    def get_order_amount(self) -> int:
+        """
+        Get the amount of non-empty orders of the strip, counted from its orders for rows inserted before the
+        n_orders column existed.
+
+        :return: amount of orders
+        """
+        n_orders: Optional[int] = self.get('n_orders')
+        return len(self.get_orders()) if n_orders is None else n_orders
+
+    def get_state_amount(self) -> int:
+        """
+        Get the amount of distinct folded states of the strip, counted from its states for rows inserted before
+        the n_states column existed.
+
+        :return: amount of states
+        """
+        n_states: Optional[int] = self.get('n_states')
+        return len(self.get_states()) if n_states is None else n_states
+
+    def get_layers(self) -> Dict[str, Dict[str, str]]:
+        """
+        Get the layer dictionary { coordinate: { order: layers } } of the strip.
+
+        :return: layer dictionary
+        """
+        if self._layers is None:
+            if self._values[1] is not None:
+                start: float = time.perf_counter()
+                self._layers = load_layers(self._connection, self._values[0], self._values[1])
+            else:
+                states: List[Dict[str, str]] = self.get_states()
+                order_states: Dict[str, int] = self.__get_order_states()
+                start: float = time.perf_counter()
+                self._layers = join_states(states, order_states)
+            self._decode_time += time.perf_counter() - start
+        return self._layers
+
+    def get_states(self) -> List[Dict[str, str]]:
+        """
+        Get the distinct folded states { coordinate: layers } of the strip, without joining them with its orders.
+
+        :return: list of states
+        """
+        if self._states is None:
+            if self._values[1] is not None:
+                layers: Dict[str, Dict[str, str]] = self.get_layers()
+                start: float = time.perf_counter()
+                self._states = split_layers(layers)[0]
+            else:
+                start: float = time.perf_counter()
+                self._states = load_states(self._connection, self._values[0], None)
+            self._decode_time += time.perf_counter() - start
+        return self._states
+
+    def get_orders(self) -> Set[str]:
+        """
+        Get the non-empty orders of the strip, without decoding its states.
+
+        :return: set of order strings
+        """
+        if self._orders is None:
+            if self._values[1] is not None:
+                self._orders = {order for order in next(iter(self.get_layers().values()), {}) if order}
+            else:
+                self._orders = {order for order in self.__get_order_states() if order}
+        return self._orders
+
+    def __get_order_states(self) -> Dict[str, int]:
+        if self._order_states is None:
+            start: float = time.perf_counter()
+            self._order_states = load_order_states(self._connection, self._values[0])
+            self._decode_time += time.perf_counter() - start
+        return self._order_states
+
+    def get_decode_time(self) -> float:
+        return self._decode_time
+
+
+class StripAnalyzer(ABC):
+    """
+    Base class of an analysis which consumes the rows of a single scan of the strips table, see run_analyses.
+    """
+    # Name under which the result and timing are reported
+    name: str = 'analysis'
+
+    def __init__(self):
+        self._done: bool = False
+
+    def accepts(self, row: StripRow) -> bool:
+        """
+        Check whether the analysis is interested in a row, such that it does not need its own query.
+
+        :param row: row of the strips table
+        :return:
+        """
+        return True
+
+    @abstractmethod
+    def consume(self, row: StripRow):
+        """
+        Analyze a single accepted row.
+
+        :param row: row of the strips table
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def merge(self, other: 'StripAnalyzer'):
+        """
+        Combine the state of a copy of this analyzer which consumed another part of the table, see run_analyses.
+
+        :param other: analyzer of the same type
+        :return:
+        """
+        pass
+
+    def finish(self):
+        """
+        Called once after the scan.
+
+        :return: result of the analysis
+        """
+        return None
+
+    def stop(self):
+        """
+        Do not feed this analyzer any more rows, the scan ends when all analyzers stopped.
+
+        :return:
+        """
+        self._done = True
+
+    def is_done(self) -> bool:
+        return self._done
+
+
+def run_analyses(analyzers: List[StripAnalyzer],
+                 fetch_size: int = 1000,
+                 timing: bool = True,
+                 workers: int = 1,
+                 shards: Optional[int] = None) -> Dict[str, object]:
+    """
+    Feed all analyzers from a single scan of the strips table, decoding the layers of each row at most once.
+    With more than one worker, the table is split into rowid ranges which are scanned in a process pool,
+    each worker with its own read-only connection and copies of the analyzers, which are merged afterwards.
+    An analyzer which stops in one shard is stopped in all shards.
+
+    :param analyzers: analyzers with distinct names
+    :param fetch_size: amount of rows fetched at once
+    :param timing: print the time spent per analyzer and on decoding layers, summed over the workers
+    :param workers: amount of worker processes, the table is scanned in this process if 1
+    :param shards: amount of rowid ranges, 4 per worker by default
+    :return: dictionary from analyzer name to its result
+    """
+    if fetch_size < 1 or workers < 1 or (shards is not None and shards < 1):
+        raise ValueError('Invalid fetch size, amount of workers or amount of shards')
+    times: Dict[str, float] = {analyzer.name: 0 for analyzer in analyzers}
+    if workers == 1:
+        connection, cur = open_database()
+        decode_time, n_rows = __scan(connection, analyzers, times, None, fetch_size)
+    else:
+        connection, cur = open_database()
+        cur.execute('SELECT MIN(rowid), MAX(rowid) FROM strips')
+        min_rowid, max_rowid = cur.fetchone()
+        connection.close()
+        decode_time, n_rows = 0, 0
+        if min_rowid is not None:
+            n_shards: int = shards if shards is not None else 4 * workers
+            step: int = (max_rowid - min_rowid) // n_shards + 1
+            stopped = Array('b', len(analyzers))
+            for i, analyzer in enumerate(analyzers):
+                stopped[i] = analyzer.is_done()
+            with Pool(workers, initializer=__init_shard_worker, initargs=(stopped,)) as pool:
+                shard_args = [(analyzers, (start, start + step), fetch_size)
+                              for start in range(min_rowid, max_rowid + 1, step)]
+                for shard_analyzers, shard_times, shard_decode_time, shard_rows in \
+                        pool.imap_unordered(__scan_shard, shard_args):
+                    for analyzer, shard_analyzer in zip(analyzers, shard_analyzers):
+                        analyzer.merge(shard_analyzer)
+                        times[analyzer.name] += shard_times[analyzer.name]
+                    decode_time += shard_decode_time
+                    n_rows += shard_rows
+    results: Dict[str, object] = {}
+    for analyzer in analyzers:
+        start: float = time.perf_counter()
+        results[analyzer.name] = analyzer.finish()
+        times[analyzer.name] += time.perf_counter() - start
+    if timing:
+        print(f'Scanned {n_rows} strips, decoding layers took {decode_time:.2f}s')
+        for name, analyzer_time in times.items():
+            print(f'{name}: {analyzer_time:.2f}s')
+    return results
+
+
+# Flags of the analyzers which stopped in any shard, shared by the workers of run_analyses
+__stopped = None
+
+
+def __init_shard_worker(stopped):
+    global __stopped
+    __stopped = stopped
+
+
+def __scan_shard(shard: Tuple[List[StripAnalyzer], Tuple[int, int], int]) \
+        -> Tuple[List[StripAnalyzer], Dict[str, float], float, int]:
+    """
+    Scan a rowid range in a worker process.
+
+    :param shard: analyzers, rowid range and fetch size
+    :return: the analyzers after the scan, time per analyzer, time spent decoding and amount of rows scanned
+    """
+    analyzers, bounds, fetch_size = shard
+    connection, _ = open_read_only_database()
+    times: Dict[str, float] = {analyzer.name: 0 for analyzer in analyzers}
+    decode_time, n_rows = __scan(connection, analyzers, times, bounds, fetch_size, __stopped)
+    connection.close()
+    return analyzers, times, decode_time, n_rows
+
+
+def __scan(connection,
+           analyzers: List[StripAnalyzer],
+           times: Dict[str, float],
+           bounds: Optional[Tuple[int, int]],
+           fetch_size: int,
+           stopped=None) -> Tuple[float, int]:
+    """
+    Feed the rows of the strips table, optionally within a rowid range, to the analyzers.
+
+    :param connection: connection to the SQLite database
+    :param analyzers: analyzers to feed
+    :param times: time per analyzer, which is increased by the time spent in it
+    :param bounds: first rowid and rowid after the last one, or None for the whole table
+    :param fetch_size: amount of rows fetched at once
+    :param stopped: shared flags of analyzers which stopped elsewhere, checked after every fetch
+    :return: time spent decoding layers and amount of rows scanned
+    """
+    cur = connection.cursor()
+    if bounds is None:
+        cur.execute(f'SELECT {", ".join(STRIP_COLUMNS)} FROM strips')
+    else:
+        cur.execute(f'SELECT {", ".join(STRIP_COLUMNS)} FROM strips WHERE rowid >= ? AND rowid < ?', bounds)
+    decode_time: float = 0
+    n_rows: int = 0
+    active: List[StripAnalyzer] = [analyzer for analyzer in analyzers if not analyzer.is_done()]
+    while len(active) > 0:
+        if stopped is not None:
+            for i, analyzer in enumerate(analyzers):
+                if stopped[i] and not analyzer.is_done():
+                    analyzer.stop()
+            active = [analyzer for analyzer in active if not analyzer.is_done()]
+            if len(active) == 0:
+                break
+        rows = cur.fetchmany(fetch_size)
+        if len(rows) == 0:
+            break
+        for values in rows:
+            row: StripRow = StripRow(connection, values)
+            for analyzer in active:
+                start: float = time.perf_counter()
+                row_decode_time: float = row.get_decode_time()
+                if analyzer.accepts(row):
+                    analyzer.consume(row)
+                # Decoding is not attributed to the analyzer which happens to need the layers first
+                times[analyzer.name] += time.perf_counter() - start - (row.get_decode_time() - row_decode_time)
+            decode_time += row.get_decode_time()
+            n_rows += 1
+            if any(analyzer.is_done() for analyzer in active):
+                if stopped is not None:
+                    for i, analyzer in enumerate(analyzers):
+                        if analyzer.is_done():
+                            stopped[i] = True
+                active = [analyzer for analyzer in active if not analyzer.is_done()]
+                if len(active) == 0:
+                    break
+    return decode_time, n_rows
@@ -1,50 +1,271 @@
-from typing import List, Dict, Tuple, Set
-from strip import Strip, get_strip_from_str, construct_strip_str, StripError
-from database_tools import open_database, insert_data, merge_databases
+from typing import List, Dict, Tuple, Set, Optional
+from strip import Strip, get_strip_from_str, construct_strip_str, StripError, parse_strip_str, \
+    get_canonical_strip, is_canonical_strip, get_crease_type, rank_strip, OrderSink
+from order_dag import OrderDag, OrderDagBuilder
+from database_tools import open_database, insert_strips, merge_databases, get_progress, load_layers, \
+    load_orders, split_layers, StripWriter, get_indexed_orders, get_common_orders, remove_duplicate_strips
+from encoding import parse_order, encode_order, encode_state
+from folding_operations import FoldabilityError
+from analysis_pipeline import StripAnalyzer, StripRow, run_analyses, STRIP_COLUMNS
+from strip_index import StripIndex, load_columns, count_bits, COLUMNS_PATH
+from histogram import Histogram2D, load_histogram, HISTOGRAM_PATH
 from visualization import visualize_layers
-import json
 import matplotlib.pyplot as plt
-import matplotlib.colors as mcl
-from functools import reduce
+import numpy as np
 import re
-from itertools import starmap
+from multiprocessing import Pool
+from contextlib import nullcontext
 
 
-def calculate_all_folds_strip_length(min_length: int = 1, max_length: int = 10, debug: bool = False) -> bool:
+def calculate_all_folds_strip_length(min_length: int = 1,
+                                     max_length: int = 10,
+                                     debug: bool = False,
+                                     workers: int = 1,
+                                     chunk_size: int = 64,
+                                     batch_size: int = 1000,
+                                     resume: bool = False,
+                                     symmetry_reduced: bool = False) -> bool:
     """
     Calculate all possible strips of some lengths.
     Length 11 | creases: 0b111111111 | mv: 0b111100100 | Strip: 1V1V1M1V1V1M1M1M1M2
+    The strips are split into chunks of M/V assignments of the same length and creases.
+    With more than one worker, the chunks are calculated in a process pool and this process writes the results
+    with a StripWriter.
+    All strips of a length and creases are committed in the same transaction as their progress marker,
+    such that an interrupted run can be resumed without partial or duplicate results.
+    Reversed strips and strips with mountain and valley folds swapped have the same orders up to relabeling,
+    with symmetry_reduced only the representative of each class (see get_canonical_strip) is calculated.
     :param: min_length: Minimum length of strips to calculate
     :param: max_length: Maximum length of strips to calculate
+    :param: debug: Print every strip which is calculated
+    :param: workers: Amount of worker processes, the strips are calculated in this process if 1
+    :param: chunk_size: Maximum amount of M/V assignments in a chunk
+    :param: batch_size: Amount of rows after which the finished lengths and creases are committed
+    :param: resume: Skip the lengths and creases which are marked as done in the database by a run which
+                    calculated at least the strips of this run
+    :param: symmetry_reduced: Only calculate the representative of each symmetry class
     :return:
     """
     if min_length < 1:
         raise StripError("Invalid minimum strip length")
+    if workers < 1 or chunk_size < 1 or batch_size < 1:
+        raise ValueError('Invalid amount of workers, chunk size or batch size')
     connection, cur = open_database()
-    merge_batch = 0
+    if remove_duplicate_strips(cur):
+        print('Removed the duplicate strips of an older database')
+    done: Set[Tuple[int, int]] = get_progress(cur, symmetry_reduced) if resume else set()
+    chunks = __get_strip_chunks(min_length, max_length, chunk_size, done, symmetry_reduced, debug)
+    # Calculated assignments and rows of the lengths and creases which are not completely calculated yet
+    pending: Dict[Tuple[int, int], Tuple[int, List[Tuple]]] = {}
+    with StripWriter(connection, batch_size) as writer, Pool(workers) if workers > 1 else nullcontext() as pool:
+        results = pool.imap_unordered(__calculate_strip_chunk, chunks) if pool else map(__calculate_strip_chunk, chunks)
+        for length, creases, n_assignments, chunk_rows in results:
+            if chunk_rows is None:
+                return False
+            calculated, calculated_rows = pending.get((length, creases), (0, []))
+            pending[(length, creases)] = (calculated + n_assignments, calculated_rows + chunk_rows)
+            if calculated + n_assignments == 2 ** bin(creases).count('1'):
+                writer.add(pending.pop((length, creases))[1], [(length, creases, symmetry_reduced)])
+    return build_order_index(batch_size)
+
+
+def __get_strip_chunks(min_length: int,
+                       max_length: int,
+                       chunk_size: int,
+                       done: Set[Tuple[int, int]],
+                       symmetry_reduced: bool,
+                       debug: bool):
+    """
+    Split all strips of the given lengths in chunks of M/V assignments with the same length and creases.
+
+    :param min_length: Minimum length of strips
+    :param max_length: Maximum length of strips
+    :param chunk_size: Maximum amount of M/V assignments in a chunk
+    :param done: the (length, creases) which are skipped
+    :param symmetry_reduced: Only calculate the representative of each symmetry class
+    :param debug: Print every strip which is calculated
+    :return: generator of (length, creases, first M/V assignment, last M/V assignment + 1, symmetry_reduced, debug)
+    """
     for length in range(min_length, max_length + 1):
         for creases in range(2 ** (length - 1)):
-            for mv_assignment in range(2 ** bin(creases).count('1')):
-                # Construct the strip string
-                strip_str: str = construct_strip_str(length, creases, mv_assignment)
-                if debug:
-                    print(f'Length {length} | creases: {bin(creases)} | mv: {bin(mv_assignment)} | Strip: {strip_str}')
-                strip: Strip = get_strip_from_str(strip_str)
-                # Calculate all valid simple foldable sequences
-                if not strip.all_simple_folds():
-                    return False
-                # Add data to the database
-                data = (strip.get_strip_string(),
-                        strip.get_length(),
-                        strip.get_crease_amount(),
-                        strip.get_n_mountain_folds(),
-                        strip.get_original_creases(),
-                        strip.get_original_folds(),
-                        json.dumps(strip.get_db())
-                        )
-                insert_data(data, cur)
-            connection.commit()
-            merge_batch += 1
+            if (length, creases) in done:
+                continue
+            n_assignments: int = 2 ** bin(creases).count('1')
+            for mv_start in range(0, n_assignments, chunk_size):
+                yield length, creases, mv_start, min(mv_start + chunk_size, n_assignments), symmetry_reduced, debug
+
+
+def __calculate_strip_chunk(chunk: Tuple[int, int, int, int, bool, bool]) -> Tuple[int, int, int, Optional[List[Tuple]]]:
+    """
+    Calculate all valid simple foldable sequences for a chunk of strips.
+
+    :param chunk: (length, creases, first M/V assignment, last M/V assignment + 1, symmetry_reduced, debug)
+    :return: length, creases, amount of M/V assignments in the chunk and the database rows of the strips,
+             or None if some strip has no valid order
+    """
+    length, creases, mv_start, mv_stop, symmetry_reduced, debug = chunk
+    rows: List[Tuple] = []
+    for mv_assignment in range(mv_start, mv_stop):
+        if symmetry_reduced and not is_canonical_strip(length, creases, mv_assignment):
+            continue
+        # Construct the strip string
+        strip_str: str = construct_strip_str(length, creases, mv_assignment)
+        if debug:
+            print(f'Length {length} | creases: {bin(creases)} | mv: {bin(mv_assignment)} | Strip: {strip_str}')
+        strip: Strip = get_strip_from_str(strip_str)
+        # Calculate all valid simple foldable sequences
+        row: Optional[Tuple[Tuple, List[bytes], bytes]] = get_strip_row(strip)
+        if row is None:
+            return length, creases, mv_stop - mv_start, None
+        rows.append(row)
+    return length, creases, mv_stop - mv_start, rows
+
+
+def get_strip_row(strip: Strip) -> Optional[Tuple[Tuple, List[bytes], bytes]]:
+    """
+    Calculate all simple folds of a strip and get its data as it is inserted by insert_strips.
+
+    :param strip: strip
+    :return: strip data, its distinct folded states and the graph of its orders, binary encoded,
+             or None if the strip is not simple foldable
+    """
+    sink: OrderDagSink = OrderDagSink()
+    if not strip.all_simple_folds(sink=sink):
+        return None
+    dag: OrderDag = sink.get_order_dag()
+    states: List[Dict[str, str]] = sink.get_states()
+    n_orders: int = dag.count_orders() if strip.get_crease_amount() > 0 else 0
+    data: Tuple = (strip.get_strip_string(),
+                   strip.get_length(),
+                   strip.get_crease_amount(),
+                   strip.get_n_mountain_folds(),
+                   strip.get_original_creases(),
+                   strip.get_original_folds(),
+                   *get_strip_statistics(strip.get_strip_string(), strip.get_crease_amount(), states, n_orders))
+    return data, [encode_state(state) for state in states], dag.encode()
+
+
+class OrderDagSink(OrderSink):
+    """
+    Builds the graph of the orders while Strip.all_simple_folds streams them, keeping only the distinct folded
+    states besides the graph, such that the completions of the search do not have to be kept.
+    The states are numbered in the order in which they are first found.
+    """
+    def __init__(self):
+        self._builder: OrderDagBuilder = OrderDagBuilder()
+        self._states: List[Dict[str, str]] = []
+        self._state_ids: Dict[bytes, int] = {}
+
+    def add(self, order: List[int], layers: Dict[str, str]):
+        state_id: int = self._state_ids.setdefault(encode_state(layers), len(self._states))
+        if state_id == len(self._states):
+            self._states.append(layers)
+        self._builder.add(order, state_id)
+
+    def get_order_dag(self) -> OrderDag:
+        return self._builder.get_order_dag()
+
+    def get_states(self) -> List[Dict[str, str]]:
+        return self._states
+
+
+def get_strip_statistics(strip_str: str,
+                         n_creases: int,
+                         states: List[Dict[str, str]],
+                         n_orders: int) -> Tuple[int, int, int, int, int]:
+    """
+    Get the statistics which are stored with a strip, such that analyses do not have to load its layers.
+
+    :param strip_str: string representing the strip
+    :param n_creases: amount of creases of the strip
+    :param states: distinct folded states of the strip
+    :param n_orders: amount of non-empty orders of the strip
+    :return: amount of non-empty orders, states, faces, the crease type and the maximum amount of layers
+    """
+    max_layer_depth: int = max((layers.count('|') + 1 for state in states for layers in state.values()), default=0)
+    return n_orders, len(states), n_creases + 1, get_crease_type(strip_str), max_layer_depth
+
+
+def backfill_strip_statistics(batch_size: int = 1000) -> bool:
+    """
+    Fill in the statistics columns of strips which were inserted before they existed.
+
+    :param batch_size: amount of strips updated per transaction
+    :return:
+    """
+    connection, cur = open_database()
+    counter: int = 0
+    while True:
+        cur.execute('SELECT strip_name, layers, n_creases FROM strips '
+                    'WHERE n_orders IS NULL OR n_states IS NULL OR n_faces IS NULL OR crease_type IS NULL '
+                    'OR max_layer_depth IS NULL LIMIT ?', (batch_size,))
+        rows = cur.fetchall()
+        if len(rows) == 0:
+            break
+        with connection:
+            for strip_name, layers, n_creases in rows:
+                states, orders = split_layers(load_layers(connection, strip_name, layers))
+                cur.execute('UPDATE strips SET n_orders = ?, n_states = ?, n_faces = ?, crease_type = ?, '
+                            'max_layer_depth = ? WHERE strip_name = ?',
+                            get_strip_statistics(strip_name, n_creases, states, sum(1 for order in orders if order))
+                            + (strip_name,))
+        counter += len(rows)
+        print(f'Backfilled {counter} strips')
+    return True
+
+
+def fill_order_counts(batch_size: int = 1000) -> bool:
+    """
+    Fill in the amount of orders of strips which were inserted without it, by counting the orders with
+    Strip.count_simple_folds instead of expanding and decoding them.
+
+    :param batch_size: amount of strips updated per transaction
+    :return:
+    """
+    connection, cur = open_database()
+    counter: int = 0
+    while True:
+        cur.execute('SELECT rowid, strip_name, n_creases FROM strips WHERE n_orders IS NULL LIMIT ?', (batch_size,))
+        rows = cur.fetchall()
+        if len(rows) == 0:
+            break
+        with connection:
+            cur.executemany('UPDATE strips SET n_orders = ? WHERE rowid = ?',
+                            [(get_strip_from_str(strip_name).count_simple_folds() if n_creases > 0 else 0, rowid)
+                             for rowid, strip_name, n_creases in rows])
+        counter += len(rows)
+        print(f'Counted the orders of {counter} strips')
+    return True
+
+
+def build_order_index(batch_size: int = 1000) -> bool:
+    """
+    Add the strips which are not indexed yet to the order index, which maps every non-empty order to the IDs of
+    the strips accepting it. Strips which are replaced after they are indexed are indexed again.
+    The index is built after calculate_all_folds_strip_length, the analyses using it build the missing part on
+    demand, such as for databases which were calculated before the index existed.
+
+    :param batch_size: amount of strips indexed per transaction
+    :return:
+    """
+    connection, cur = open_database()
+    counter: int = 0
+    while True:
+        cur.execute('SELECT rowid, strip_name, layers FROM strips WHERE orders_indexed IS NULL LIMIT ?',
+                    (batch_size,))
+        rows = cur.fetchall()
+        if len(rows) == 0:
+            break
+        with connection:
+            for rowid, strip_name, layers in rows:
+                strip_id: int = rank_strip(*parse_strip_str(strip_name))
+                cur.execute('DELETE FROM order_strips WHERE strip_id = ?', (strip_id,))
+                cur.executemany('INSERT INTO order_strips(fold_order, strip_id) VALUES(?, ?)',
+                                [(encode_order(parse_order(order)), strip_id)
+                                 for order in load_orders(connection, strip_name, layers)])
+            cur.executemany('UPDATE strips SET orders_indexed = 1 WHERE rowid = ?', [(row[0],) for row in rows])
+        counter += len(rows)
+        print(f'Indexed the orders of {counter} strips')
     return True
 
 
@@ -73,73 +294,84 @@ def read_database_layers(layers: Dict[str, List[int]]) -> Dict[Tuple[int, int, i
     return layer_dict
 
 
-def construct_global_order(layers: Dict[str, Dict[str, str]], order: str) -> Dict[int, Set[int]]:
+def has_layer_cycle(state: Dict[str, str], n_faces: int, in_degree: List[int], above: List[List[int]]) -> bool:
     """
-    Return a dictionary for each face which other faces are directly below it.
+    Check whether the layers of a folded state contradict each other, such that the faces cannot be stacked.
+    Only the faces which are adjacent in a stack are connected, the faces are sorted topologically from the bottom.
 
-    :param layers:
-    :param order:
-    :return:
+    :param state: folded state { coordinate: layers }
+    :param n_faces: amount of faces of the strip
+    :param in_degree: buffer with at least an entry per face, overwritten
+    :param above: buffer with at least a list per face, overwritten
+    :return: whether there is a cycle
     """
-    adjacency_dict: Dict[int, Set[int]] = {}
-    for _, layer_list in layers.items():
-        previous: List[int] = []
-        for layer_str in layer_list[order].split('|'):
-            layer: int = int(layer_str)
-            for face in previous:
-                if face not in adjacency_dict:
-                    adjacency_dict[face] = set()
-                adjacency_dict[face].add(int(layer))
-            previous.append(layer)
-    return adjacency_dict
-
-
-def detect_cycle(adjacency_dict: Dict[int, Set[int]], face: int, visited: List[bool], rec_stack: List[bool]) -> bool:
-    """
-    Check whether there exists a cycle in a given layer dictionary.
-    :param adjacency_dict:
-    :param face:
-    :param visited:
-    :param rec_stack:
-    :return:
+    for face in range(n_faces):
+        in_degree[face] = 0
+        above[face].clear()
+    for stack in state.values():
+        faces: List[int] = [int(face) for face in stack.split('|')]
+        for lower, upper in zip(faces, faces[1:]):
+            above[lower].append(upper)
+            in_degree[upper] += 1
+    bottom: List[int] = [face for face in range(n_faces) if in_degree[face] == 0]
+    n_sorted: int = 0
+    while len(bottom) > 0:
+        face: int = bottom.pop()
+        n_sorted += 1
+        for upper in above[face]:
+            in_degree[upper] -= 1
+            if in_degree[upper] == 0:
+                bottom.append(upper)
+    return n_sorted < n_faces
+
+
+class CycleAnalyzer(StripAnalyzer):
     """
-    visited[face] = True
-    rec_stack[face] = True
-    for neighbor in adjacency_dict[face]:
-        if not visited[neighbor]:
-            if detect_cycle(adjacency_dict, neighbor, visited, rec_stack):
-                return True
-        elif rec_stack[neighbor]:
-            return True
-    rec_stack[face] = False
-    return False
+    Check if there exists a layer cycle in the database.
+    """
+    name = 'find_any_cycle'
+
+    def __init__(self):
+        super().__init__()
+        self._found: bool = False
+        # Buffers of has_layer_cycle, grown to the largest amount of faces
+        self._in_degree: List[int] = []
+        self._above: List[List[int]] = []
+
+    def accepts(self, row: StripRow) -> bool:
+        return row.get('len') > 1 and row.get('n_creases') > 1
+
+    def consume(self, row: StripRow):
+        print(f'Testing {row.get_strip_name()}')
+        n_faces: int = row.get('n_faces') or row.get('n_creases') + 1
+        while len(self._above) < n_faces:
+            self._in_degree.append(0)
+            self._above.append([])
+        # Orders which end in the same folded state have the same layers, every state is checked once
+        for state in row.get_states():
+            if has_layer_cycle(state, n_faces, self._in_degree, self._above):
+                layers = row.get_layers()
+                order: str = next(order for order in sorted(row.get_orders())
+                                  if all(layers[coordinate][order] == stack for coordinate, stack in state.items()))
+                print(f'Strip {row.get_strip_name()}: {order}')
+                self._found = True
+                self.stop()
+                return
+
+    def merge(self, other: 'CycleAnalyzer'):
+        self._found |= other._found
 
+    def finish(self) -> bool:
+        return self._found
 
-def find_any_cycle():
+
+def find_any_cycle(workers: int = 1):
     """
     Check if there exists a layer cycle in the database.
+    :param: workers: Amount of worker processes scanning the database
     :return:
     """
-    connection, cur = open_database()
-    # Get strips
-    cur.execute(f'SELECT strip_name, layers, n_creases FROM strips WHERE len>? AND n_creases>?', (1, 1))
-    for row in cur:
-        print(f'Testing {row[0]}')
-        layers = json.loads(row[1])
-        all_orders: Set[str] = get_all_orders(layers)
-        all_faces: List[int] = list(map(lambda x: int(x), all_orders.pop().split('|')))
-        all_faces.append(max(all_faces) + 1)
-        visited: List[bool] = [False] * (len(all_faces))
-        rec_stack: List[bool] = [False] * (len(all_faces))
-        for order in all_orders:
-            adjacency_dict: Dict[int, Set[int]] = construct_global_order(layers, order)
-            for face in all_faces:
-                if face not in adjacency_dict:
-                    adjacency_dict[face] = set()
-            if detect_cycle(adjacency_dict, 0, visited, rec_stack):
-                print(f'Strip {row[0]}: {order}')
-                return True
-    return False
+    return run_analyses([CycleAnalyzer()], workers=workers)[CycleAnalyzer.name]
 
 
 def same_order(layer_dict: Dict[str, Dict[str, str]], all_orders: List[str]) -> int:
@@ -173,28 +405,22 @@ def get_all_orders(layer_dict: Dict[str, Dict[str, str]]) -> Set[str]:
     return all_orders
 
 
-def get_order_intersection(orders: Dict[str, Dict[str, str]], order_set: Set[str]):
-    all_orders: Set[str] = get_all_orders(orders)
-    intersection = order_set.intersection(all_orders)
-    return intersection
-
-
-def get_orders_union(orders: Dict[str, Dict[str, str]], order_set: Set[str]) -> Set[str]:
-    all_orders: Set[str] = get_all_orders(orders)
-    union = order_set.union(all_orders)
-    return union
-
-
-def test_if_consecutive_exists():
+class ConsecutiveAnalyzer(StripAnalyzer):
     """
     See if there exists a strip which has no order containing consecutive layers
-    :return:
     """
-    connection, cur = open_database()
-    cur.execute(f'SELECT strip_name, layers, n_creases FROM strips WHERE n_creases > 1')
-    for row in cur:
-        json_object = json.loads(row[1])
-        all_orders: List[str] = list(get_all_orders(json_object))
+    name = 'test_if_consecutive_exists'
+
+    def __init__(self):
+        super().__init__()
+        self._all_consecutive: bool = True
+
+    def accepts(self, row: StripRow) -> bool:
+        return row.get('n_creases') > 1
+
+    def consume(self, row: StripRow):
+        json_object = row.get_layers()
+        all_orders: List[str] = list(row.get_orders())
         n_layers: int = len(all_orders[0].split('|'))
         for i in range(n_layers - 1):
             found_consecutive: bool = False
@@ -203,15 +429,30 @@ def test_if_consecutive_exists():
                     if f'{i}' in layers and f'{i + 1}' in layers and (
                             f'{i}|{i + 1}' in layers or f'{i + 1}|{i}' in layers):
                         found_consecutive = True
-                        print(f'Found consecutive {i}|{i + 1} in {row[0]}: {order}')
+                        print(f'Found consecutive {i}|{i + 1} in {row.get_strip_name()}: {order}')
                         break
                 if found_consecutive:
                     break
             if not found_consecutive:
-                print(f'Did not found consecutive {i}|{i + 1} for strip: {row[0]}')
+                print(f'Did not found consecutive {i}|{i + 1} for strip: {row.get_strip_name()}')
                 print(f'{json_object}')
-                return False
-    return True
+                self._all_consecutive = False
+                self.stop()
+                return
+
+    def merge(self, other: 'ConsecutiveAnalyzer'):
+        self._all_consecutive &= other._all_consecutive
+
+    def finish(self) -> bool:
+        return self._all_consecutive
+
+
+def test_if_consecutive_exists():
+    """
+    See if there exists a strip which has no order containing consecutive layers
+    :return:
+    """
+    return run_analyses([ConsecutiveAnalyzer()])[ConsecutiveAnalyzer.name]
 
 
 def analyze_states_length_intersection():
@@ -220,6 +461,7 @@ def analyze_states_length_intersection():
 
     :return:
     """
+    build_order_index()
     connection, cur = open_database()
     # Get strips
     all_intersecting: Set[str] = set()
@@ -229,23 +471,23 @@ def analyze_states_length_intersection():
         name = ''
         base: Set[str] = set()
         for i in range(7, 11):
-            cur.execute(f'SELECT strip_name, layers, M_creases, len, n_creases, n_states, crease_direction '
-                        f'FROM strips WHERE len=? AND crease_direction=? AND n_creases=?', (i, j, 8))
-            for row in cur:
+            cur.execute(f'SELECT strip_name FROM strips WHERE len=? AND crease_direction=? AND n_creases=?',
+                        (i, j, 8))
+            strip_names: List[str] = [row[0] for row in cur.fetchall()]
+            strip_ids: List[int] = [rank_strip(*parse_strip_str(strip_name)) for strip_name in strip_names]
+            strip_orders: Dict[int, Set[str]] = get_indexed_orders(cur, strip_ids)
+            for strip_name, strip_id in zip(strip_names, strip_ids):
                 if name == '':
-                    name = row[0]
-                state_length_set: Set[str] = set()
-                json_object = json.loads(row[1])
-                state_length_set = get_orders_union(json_object, state_length_set)
-                list_rep: List[str] = list(get_all_orders(json_object))
-                list_rep.sort()
+                    name = strip_name
+                state_length_set: Set[str] = strip_orders[strip_id]
+                list_rep: List[str] = sorted(state_length_set)
                 if i == 9:
                     base = set(list_rep)
                 if len(list_rep) < 50:
-                    print(f'Length {i}, {row[0]}: {list_rep}')
+                    print(f'Length {i}, {strip_name}: {list_rep}')
                 else:
-                    print(f'Length {i}, {row[0]}: {len(list_rep)}')
-                intersection = list(base.intersection(set(list_rep)))
+                    print(f'Length {i}, {strip_name}: {len(list_rep)}')
+                intersection = list(base.intersection(state_length_set))
                 if len(intersection) < 50:
                     print(f'Intersection: {intersection}')
                 else:
@@ -270,86 +512,99 @@ def analyze_states():
     """
     connection, cur = open_database()
     # Get strips
-    cur.execute(f'SELECT strip_name, layers, M_creases, len, n_creases, n_states, crease_direction '
-                f'FROM strips WHERE crease_direction=?', (0, ))
+    cur.execute(f'SELECT {", ".join(STRIP_COLUMNS)} FROM strips WHERE crease_direction=?', (0, ))
     write_cursor = connection.cursor()
-    n_states = []
-    n_orders = []
-    m_creases = []
-    length = []
-    n_creases = []
-    mv_assignment = []
-    counter = 0
+    histogram: Histogram2D = Histogram2D((100, 100), (0, 0), (1, 1))
+    max_states: int = 0
     analyze_states_length_intersection()
     least_orders = {}
-    for row in cur:
-        if '0' in row[0]:
-            print(row[0])
-        orders = row[5]
-        json_object = json.loads(row[1])
-        all_orders: Set[str] = get_all_orders(json_object)
-        if row[4] not in least_orders or least_orders[row[4]][1] > len(all_orders):
-            least_orders[row[4]] = (row[0], len(all_orders))
-        if row[6] == -1:
-            strip: Strip = get_strip_from_str(row[0])
-            print(f'Folds {row[0]}: {row[6]} -> {strip.get_original_creases()}')
+    for values in cur:
+        row: StripRow = StripRow(connection, values)
+        strip_name: str = row.get_strip_name()
+        if '0' in strip_name:
+            print(strip_name)
+        # Rows of older databases have no statistics, their orders and states are counted instead
+        n_orders: int = row.get_order_amount()
+        orders = row.get_state_amount()
+        if row.get('n_creases') not in least_orders or least_orders[row.get('n_creases')][1] > n_orders:
+            least_orders[row.get('n_creases')] = (strip_name, n_orders)
+        if row.get('crease_direction') == -1:
+            strip: Strip = get_strip_from_str(strip_name)
+            print(f'Folds {strip_name}: {row.get("crease_direction")} -> {strip.get_original_creases()}')
             write_cursor.execute(f'UPDATE strips SET crease_direction = {strip.get_original_creases()} '
-                                 f'WHERE strip_name = "{row[0]}"')
+                                 f'WHERE strip_name = "{strip_name}"')
             connection.commit()
-        n_states.append(orders)
-        m_creases.append(row[2])
-        n_orders.append(len(all_orders))
-        length.append(row[3])
-        n_creases.append(row[4])
-        mv_assignment.append(row[6])
-
-        counter += 1
+        histogram.add(n_orders, orders)
+        max_states = max(max_states, orders)
     print(f'Least orders: {least_orders}')
-    print(f'Max states: {max(n_states)}')
-    plt.hist2d(n_orders, n_states, norm=mcl.LogNorm(), cmap=plt.cm.get_cmap('jet').copy(), cmin=1,
-               bins=(100, 100))  # bins=(max(n_orders), max(n_states)))
-    plt.xlabel('Number of orders')
-    plt.ylabel('Number of states')
-    plt.colorbar()
+    print(f'Max states: {max_states}')
+    histogram.save('analyze_states')
+    histogram.plot('Number of orders', 'Number of states')
     plt.show()
     return True
 
 
-def visualize_order_amount():
+class OrderAmountAnalyzer(StripAnalyzer):
     """
     Visualize a 2D histogram with the amount of valid flat folding orders
     in relation to the percentage of mountain creases.
+    """
+    name = 'visualize_order_amount'
+
+    def __init__(self):
+        super().__init__()
+        self._histogram: Histogram2D = get_order_amount_histogram()
+
+    def accepts(self, row: StripRow) -> bool:
+        return 1 < row.get('n_creases') < 11
+
+    def consume(self, row: StripRow):
+        mv_assignment: int = row.get('crease_direction')
+        p_mountain: float = (bin(mv_assignment).count('1') / row.get('n_creases'))
+        self._histogram.add(p_mountain, row.get_order_amount())
+
+    def merge(self, other: 'OrderAmountAnalyzer'):
+        self._histogram.merge(other._histogram)
+
+    def finish(self) -> bool:
+        self._histogram.save(self.name)
+        self._histogram.plot('Mountain folds (%)', 'Amount of valid folding orders')
+        plt.show()
+        return True
+
+
+def get_order_amount_histogram() -> Histogram2D:
+    """
+    Get an empty histogram of the amount of valid folding orders against the percentage of mountain creases.
+    The percentages are binned on multiples of 2 percent, the bins of the amounts grow with the largest amount.
     :return:
     """
-    connection, cur = open_database()
-    # Get strips
-    cur.execute(f'SELECT strip_name, layers, crease_direction, n_creases FROM strips '
-                f'WHERE n_creases>? AND n_creases<?', (1, 11))
-    percentages: List[float] = []
-    n_orders: List[int] = []
-    counter: int = 0
-    for row in cur:
-        mv_assignment: int = row[2]
-        p_mountain: float = (bin(mv_assignment).count('1') / row[3])
-        percentages.append(p_mountain)
-
-        # Get all orders
-        json_object = json.loads(row[1])
-        orders: int = len(get_all_orders(json_object))
-        n_orders.append(orders)
-        if counter > 1000000:
-            break
-        counter += 1
-    my_cmap = plt.cm.get_cmap('jet').copy()
-    my_cmap.set_bad('w')
-    plt.hist2d(x=percentages, y=n_orders, bins=50, norm=mcl.LogNorm(), cmap=my_cmap, cmin=1)
-    plt.colorbar()
-    plt.xlabel('Mountain folds (%)')
-    plt.ylabel('Amount of valid folding orders')
+    return Histogram2D((51, 50), (-0.01, 0), (0.02, 1))
+
+
+def visualize_histogram(name: str, x_label: str, y_label: str, directory: str = HISTOGRAM_PATH):
+    """
+    Visualize a histogram saved by visualize_order_amount or analyze_states, without scanning the database.
+    :param name: name of the histogram, the name of the analysis which saved it
+    :param x_label: label of the x axis
+    :param y_label: label of the y axis
+    :param directory: directory of the histogram files
+    :return:
+    """
+    load_histogram(name, directory).plot(x_label, y_label)
     plt.show()
     return True
 
 
+def visualize_order_amount():
+    """
+    Visualize a 2D histogram with the amount of valid flat folding orders
+    in relation to the percentage of mountain creases.
+    :return:
+    """
+    return run_analyses([OrderAmountAnalyzer()])[OrderAmountAnalyzer.name]
+
+
 def fold_least_crease_strategy(strip: str) -> bool:
     """
     Fold the crease which is adjacent to the shortest face.
@@ -366,50 +621,67 @@ def fold_least_crease_strategy(strip: str) -> bool:
     return strip_object.is_simple_foldable_order(fold_order, visualization=False)
 
 
-def __is_subset_of(strip_1: str, strip_2: str) -> bool:
-    if strip_2 == strip_1:
-        return False
-    face_lengths_1: List[str] = re.split('[A-Z]', strip_1)
-    face_lengths_2: List[str] = re.split('[A-Z]', strip_2)
-    face_lengths: List[int] = list(starmap(lambda a, b: int(a) - int(b), zip(face_lengths_1, face_lengths_2)))
-    for length in face_lengths:
-        if length > 0:
-            return False
-    # print(f'{strip_2} subset of {strip_1}')
-    return True
+def __get_crease_pattern_groups(strips: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Parse the face lengths of the strips once and group the strips by their crease pattern.
+    Within a group the strips are sorted by their total length, a sub-strip is never longer in total.
+
+    :param strips: strip strings
+    :return: per crease pattern the indices of its strips and their face lengths, one row per strip
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, strip in enumerate(strips):
+        groups.setdefault(''.join(re.findall('[A-Z]', strip)), []).append(i)
+    sorted_groups: List[Tuple[np.ndarray, np.ndarray]] = []
+    for indices in groups.values():
+        face_lengths: np.ndarray = np.array([[int(length) for length in re.split('[A-Z]', strips[i])]
+                                             for i in indices], dtype=np.int64)
+        by_total: np.ndarray = np.argsort(face_lengths.sum(axis=1), kind='stable')
+        sorted_groups.append((np.array(indices, dtype=np.int64)[by_total], face_lengths[by_total]))
+    return sorted_groups
 
 
 def construct_order_lattice(order_dict: Dict[str, Set[str]]) -> Dict[str, List[str]]:
     """
     Construct a lattice from all given orders.
+    A strip is above the strips with the same crease pattern of which no face is longer.
     :param order_dict:
     :return: A lattice with all orders
     """
+    strips: List[str] = list(order_dict)
+    groups: List[Tuple[np.ndarray, np.ndarray]] = __get_crease_pattern_groups(strips)
+    group_totals: List[np.ndarray] = [face_lengths.sum(axis=1) for _, face_lengths in groups]
+    positions: List[Tuple[int, int]] = [(0, 0)] * len(strips)
+    for group, (indices, _) in enumerate(groups):
+        for position, i in enumerate(indices.tolist()):
+            positions[i] = (group, position)
     # Construct a lattice adjacency matrix if the strip_2 is a subset of strip_1
-    lattice: Dict[str, List[str]] = {}
-    for strip_1 in order_dict:
-        lattice[strip_1] = []
-        for strip_2 in order_dict:
-            if strip_2 != strip_1 and __is_subset_of(strip_2, strip_1):
-                lattice[strip_1].append(strip_2)
-        print(f'{strip_1}: {lattice[strip_1]}')
-    # Find intersections between the strip and its sub-strips
-    for strip, adj in lattice.items():
-        intersection: Set[str] = reduce(lambda a, b: a.intersection(order_dict[b]), adj, order_dict[strip])
+    covers: List[List[int]] = []
+    for i, strip_1 in enumerate(strips):
+        group, position = positions[i]
+        indices, face_lengths = groups[group]
+        # Only the strips which are not longer in total can be sub-strips
+        end: int = int(np.searchsorted(group_totals[group], group_totals[group][position], side='right'))
+        below: np.ndarray = np.flatnonzero((face_lengths[:end] <= face_lengths[position]).all(axis=1))
+        below = below[below != position]
+        print(f'{strip_1}: {[strips[j] for j in np.sort(indices[below])]}')
+        # The longest remaining sub-strip is a direct sub-strip, its own sub-strips are not
+        strip_covers: List[int] = []
+        remaining: np.ndarray = below[::-1]
+        while len(remaining) > 0:
+            strip_covers.append(int(indices[remaining[0]]))
+            remaining = remaining[~(face_lengths[remaining] <= face_lengths[remaining[0]]).all(axis=1)]
+        covers.append(sorted(strip_covers))
+    # Find intersections between the strip and its sub-strips, from the intersections of its direct sub-strips
+    intersections: List[Set[str]] = [set()] * len(strips)
+    for indices, _ in groups:
+        for i in indices.tolist():
+            intersections[i] = order_dict[strips[i]].intersection(*(intersections[j] for j in covers[i]))
+    for strip, intersection in zip(strips, intersections):
         print(f'Intersection {strip}: {intersection}')
         if len(intersection) == 0:
             raise ValueError  # Create custom exception for this
-    # Clean up lattice to only include roots
-    for ele, adj in lattice.items():
-        to_remove = []
-        for strip in adj:
-            to_remove.extend(lattice[strip])
-        for strip in to_remove:
-            try:
-                lattice[ele].remove(strip)
-            except ValueError:
-                pass
-    return lattice
+    return {strip: [strips[j] for j in strip_covers] for strip, strip_covers in zip(strips, covers)}
 
 
 def analyze_same_crease_patterns():
@@ -417,6 +689,7 @@ def analyze_same_crease_patterns():
     Check for missing similar orders in lattice ordered strips.
     :return:
     """
+    build_order_index()
     connection, cur = open_database()
     # Get strips
     print('Start analysis')
@@ -428,24 +701,28 @@ def analyze_same_crease_patterns():
                 minimum_orders: Set[str] = set()
                 orders: Set[str] = set()
                 print(f'Analyze: {n_creases} {crease_type}')
-                cur.execute(f'SELECT strip_name, layers, len, creases, crease_type, n_creases, crease_direction '
-                            f'FROM strips WHERE crease_type=? AND n_creases=? AND crease_direction=?',
+                cur.execute(f'SELECT strip_name FROM strips WHERE crease_type=? AND n_creases=? AND crease_direction=?',
                             (crease_type, n_creases, crease_assignment))
-                # cur.execute(f'SELECT * FROM strips')
-                for row in cur:
-                    json_object = json.loads(row[1])
-                    all_orders = get_all_orders(json_object)
-                    order_dict[row[0]] = all_orders
+                strip_names: List[str] = [row[0] for row in cur.fetchall()]
+                strip_ids: List[int] = [rank_strip(*parse_strip_str(strip_name)) for strip_name in strip_names]
+                strip_orders: Dict[int, Set[str]] = get_indexed_orders(cur, strip_ids)
+                # If some order is valid for all strips, every strip intersects with the previous strips
+                all_intersecting: bool = len(strip_ids) == 0 or len(get_common_orders(cur, strip_ids)) > 0
+                for strip_name, strip_id in zip(strip_names, strip_ids):
+                    all_orders = strip_orders[strip_id]
+                    order_dict[strip_name] = all_orders
+                    if all_intersecting:
+                        continue
                     if len(minimum_orders) == 0:
                         minimum_orders = all_orders
                     if len(orders) == 0:
                         orders = all_orders
                     else:
-                        orders = get_order_intersection(json_object, orders)
+                        orders = orders.intersection(all_orders)
                     # Check if there exists an order which is valid for this and all previous strips
-                    minimum_intersection = get_order_intersection(json_object, minimum_orders)
+                    minimum_intersection = minimum_orders.intersection(all_orders)
                     if len(minimum_intersection) == 0 or len(orders) == 0:
-                        print(f'Not all intersecting: {row[0]}')
+                        print(f'Not all intersecting: {strip_name}')
                         print(f'N_creases: {n_creases}, crease type: {crease_type}, '
                               f'crease assignment: {crease_assignment}')
                         return False
@@ -470,16 +747,7 @@ def insert_same_crease_patterns():
     cur.execute(f'SELECT strip_name, len, n_creases, crease_direction FROM strips')
     write_cursor = connection.cursor()
     for row in cur:
-        face_lengths: List[str] = re.split('[A-Z]', row[0])
-        face_lengths: List[int] = list(map(lambda x: int(x), face_lengths))
-        crease_type: int = 0
-        crease_index: int = 0
-        strip_length: int = 0
-        for face in face_lengths[:-1]:
-            strip_length += face
-            if strip_length % 2 == 1:
-                crease_type |= (1 << crease_index)
-            crease_index += 1
+        crease_type: int = get_crease_type(row[0])
         write_cursor.execute(f'UPDATE strips SET crease_type = {crease_type} '
                              f'WHERE strip_name = "{row[0]}"')
         print(f'Altered: {row[0]} | {bin(crease_type)}')
@@ -491,73 +759,207 @@ def get_order_from_str(order: str) -> List[int]:
     return list(map(lambda x: int(x), order.split('|')))
 
 
-def analyze_no_two_direction_fold():
+def visualize_exported_order_amount(directory: str = COLUMNS_PATH, chunk_size: int = 1000000):
     """
-    Check if we can always simple fold a strip by only folding creases which move the paper either up or down, not both.
-    Might be usefull for a foldability proof.
+    Visualize the histogram of visualize_order_amount from the columns written by export_columns,
+    computed with array operations over all strips instead of a scan of the database.
+    Strips exported without amount of orders are skipped, see fill_order_counts.
+    :param directory: directory of the exported columns
+    :param chunk_size: amount of strip IDs binned at once
     :return:
     """
-    connection, cur = open_database()
-    # Get strips
-    cur.execute(f'SELECT strip_name, layers, len, n_creases, crease_direction FROM strips')
-    for row in cur:
-        print(f'Testing {row[0]}')
-        json_object = json.loads(row[1])
-        orders: Set[str] = get_all_orders(json_object)
+    columns: Dict[str, np.ndarray] = load_columns(directory)
+    histogram: Histogram2D = get_order_amount_histogram()
+    n_missing: int = 0
+    # The memory mapped columns are binned in chunks, such that they are never completely in memory
+    for start in range(0, len(columns['len']), chunk_size):
+        n_creases: np.ndarray = columns['n_creases'][start:start + chunk_size]
+        n_orders: np.ndarray = columns['n_orders'][start:start + chunk_size]
+        mask: np.ndarray = (columns['len'][start:start + chunk_size] > 0) & (n_creases > 1) & (n_creases < 11)
+        # Columns which were missing in the database are exported as -1
+        n_missing += int(np.count_nonzero(mask & (n_orders < 0)))
+        mask &= n_orders >= 0
+        histogram.add_chunk(count_bits(columns['crease_direction'][start:start + chunk_size][mask], 10)
+                            / n_creases[mask], n_orders[mask])
+    if n_missing > 0:
+        print(f'Skipped {n_missing} strips without amount of orders')
+    histogram.plot('Mountain folds (%)', 'Amount of valid folding orders')
+    plt.show()
+    return True
+
+
+class NoTwoDirectionFoldAnalyzer(StripAnalyzer):
+    """
+    Check if we can always simple fold a strip by only folding creases which move the paper either up or down, not both.
+    """
+    name = 'analyze_no_two_direction_fold'
+
+    def __init__(self):
+        super().__init__()
+        self._all_one_way: bool = True
+
+    def consume(self, row: StripRow):
+        print(f'Testing {row.get_strip_name()}')
+        orders: Set[str] = row.get_orders()
         if len(orders) > 0:
-            strip: Strip = get_strip_from_str(row[0])
+            strip: Strip = get_strip_from_str(row.get_strip_name())
             found_one_way_order: bool = False
             for order in orders:
                 if strip.is_simple_foldable_order(get_order_from_str(order), one_way_fold=True, visualization=False):
                     found_one_way_order = True
                     break
-                strip.reset_strip()
+                strip.unfold_all()
             if not found_one_way_order:
-                print(f'Found unfoldable strip: {row[0]}')
-                return False
-    return True
+                print(f'Found unfoldable strip: {row.get_strip_name()}')
+                self._all_one_way = False
+                self.stop()
+
+    def merge(self, other: 'NoTwoDirectionFoldAnalyzer'):
+        self._all_one_way &= other._all_one_way
+
+    def finish(self) -> bool:
+        return self._all_one_way
+
+
+def analyze_no_two_direction_fold(workers: int = 1):
+    """
+    Check if we can always simple fold a strip by only folding creases which move the paper either up or down, not both.
+    Might be usefull for a foldability proof.
+    :param: workers: Amount of worker processes scanning the database
+    :return:
+    """
+    return run_analyses([NoTwoDirectionFoldAnalyzer()], workers=workers)[NoTwoDirectionFoldAnalyzer.name]
+
+
+def get_strip_layers(cur, strip_str: str, index: Optional[StripIndex] = None) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Get the layer dictionary of a strip from the database.
+    If the strip itself is not stored, it is derived from the stored representative of its symmetry class.
+
+    :param cur: cursor of the SQLite database
+    :param strip_str: Strip string
+    :param index: strip index to find the row by its rowid instead of its name
+    :return: layer dictionary, or None if neither the strip nor its representative is in the database
+    """
+    data = None
+    if index is not None and parse_strip_str(strip_str)[0] <= index.get_max_length():
+        rowid: Optional[int] = index.get_rowid(strip_str)
+        if rowid is not None:
+            cur.execute('SELECT strip_name, layers FROM strips WHERE rowid=?', (rowid,))
+            data = cur.fetchone()
+    # Rowids change when strips are replaced or the database is vacuumed after the index was built
+    if data is None or data[0] != strip_str:
+        cur.execute('SELECT strip_name, layers FROM strips WHERE strip_name=?', (strip_str,))
+        data = cur.fetchone()
+    if data is not None:
+        return load_layers(cur.connection, *data)
+    length, creases, mv_assignment = parse_strip_str(strip_str)
+    canonical_creases, canonical_assignment, is_reversed, is_complemented = \
+        get_canonical_strip(length, creases, mv_assignment)
+    cur.execute('SELECT strip_name, layers FROM strips WHERE strip_name=?',
+                (construct_strip_str(length, canonical_creases, canonical_assignment),))
+    data = cur.fetchone()
+    if data is None:
+        return None
+    return derive_symmetric_layers(strip_str, load_layers(cur.connection, *data), is_reversed, is_complemented)
+
+
+def derive_symmetric_layers(strip_str: str,
+                            layers: Dict[str, Dict[str, str]],
+                            is_reversed: bool,
+                            is_complemented: bool) -> Dict[str, Dict[str, str]]:
+    """
+    Derive the layer dictionary of a strip from the layer dictionary of a symmetric strip.
+    Swapping mountain and valley folds turns every layer stack upside down.
+    A reversed strip folds in the reversed crease labels, its layers are found by folding it in those orders.
+
+    :param strip_str: Strip string of the strip to derive
+    :param layers: layer dictionary of the symmetric strip
+    :param is_reversed: whether strip_str is the reversal of the symmetric strip
+    :param is_complemented: whether strip_str has the mountain and valley folds of the symmetric strip swapped
+    :return: layer dictionary of strip_str
+    """
+    if not is_reversed:
+        if not is_complemented:
+            return layers
+        return {coordinate: {order: '|'.join(reversed(stack.split('|'))) for order, stack in orders.items()}
+                for coordinate, orders in layers.items()}
+    strip: Strip = get_strip_from_str(strip_str)
+    n_creases: int = strip.get_crease_amount()
+    strip.add_orders_to_database([[n_creases - 1 - crease for crease in get_order_from_str(order)] if order else []
+                                  for order in get_all_orders(layers) or {''}])
+    return strip.get_db()
 
 
 def analyze_strip(strip_str: str) -> bool:
     connection, cur = open_database()
-    cur.execute(f'SELECT strip_name, layers FROM strips WHERE strip_name=?',
-                (strip_str,))
+    layers: Optional[Dict[str, Dict[str, str]]] = get_strip_layers(cur, strip_str)
     strip: Strip = get_strip_from_str(strip_str)
-    data = cur.fetchone()
-    if data is None:
+    if layers is None:
         print(f'Getting new strip information: {strip_str}')
-        strip.all_simple_folds()
-        data = (strip.get_strip_string(),
-                strip.get_length(),
-                strip.get_crease_amount(),
-                strip.get_n_mountain_folds(),
-                strip.get_original_creases(),
-                strip.get_original_folds(),
-                json.dumps(strip.get_db())
-                )
-        insert_data(data, cur)
-        data = (strip.get_strip_string(), json.dumps(strip.get_db()))
+        row: Optional[Tuple[Tuple, List[bytes], bytes]] = get_strip_row(strip)
+        if row is None:
+            raise FoldabilityError(strip_str)
+        with connection:
+            insert_strips([row], cur)
+        layers = get_strip_layers(cur, strip_str)
     else:
         print(f'Found in database: {strip_str}')
-    json_object = json.loads(data[1])
+    json_object = layers
     orders: Set[str] = get_all_orders(json_object)
     random_order: str = next(iter(orders))
-    print(f'Strip {data[0]}\n'
+    print(f'Strip {strip_str}\n'
           f'Number of orders: {len(orders)}\n'
           f'Visualizing: {random_order}')
     visualize_layers(json_object, random_order)
     return True
 
 
+class StampFoldingAnalyzer(StripAnalyzer):
+    """
+    Count the distinct orders of the strips of unit faces, which fold like a strip of stamps, per length.
+    """
+    name = 'analyze_stamp_folding'
+
+    def __init__(self):
+        super().__init__()
+        self._all_orders: Dict[int, Set[str]] = {length: set() for length in range(2, 11)}
+
+    def accepts(self, row: StripRow) -> bool:
+        return row.get('len') in self._all_orders and row.get('n_creases') == row.get('len') - 1
+
+    def consume(self, row: StripRow):
+        self._all_orders[row.get('len')].update(row.get_orders())
+
+    def merge(self, other: 'StampFoldingAnalyzer'):
+        for length, all_orders in other._all_orders.items():
+            self._all_orders[length].update(all_orders)
+
+    def finish(self) -> bool:
+        for length, all_orders in self._all_orders.items():
+            print(f'Strip length: {length}\n'
+                  f'Number of orders: {len(all_orders)}\n')
+        return True
+
+
 def analyze_stamp_folding():
-    connection, cur = open_database()
-    for length in range(2, 11):
-        all_orders: set[str] = set()
-        cur.execute(f'SELECT strip_name, layers, len, n_creases FROM strips WHERE len=? AND n_creases=?',
-                    (length, length-1))
-        for row in cur:
-            json_object = json.loads(row[1])
-            all_orders.update(get_all_orders(json_object))
-        print(f'Strip length: {length}\n'
-              f'Number of orders: {len(all_orders)}\n')
-    return True
+    """
+    Count the distinct orders of the strips of unit faces per length.
+    :return:
+    """
+    return run_analyses([StampFoldingAnalyzer()])[StampFoldingAnalyzer.name]
+
+
+def run_analysis_suite(fetch_size: int = 1000, workers: int = 1) -> Dict[str, object]:
+    """
+    Run all streaming analyses on a single scan of the strips table.
+
+    :param fetch_size: amount of rows fetched at once
+    :param workers: amount of worker processes scanning the database
+    :return: dictionary from analysis name to its result
+    """
+    return run_analyses([CycleAnalyzer(),
+                         ConsecutiveAnalyzer(),
+                         NoTwoDirectionFoldAnalyzer(),
+                         StampFoldingAnalyzer(),
+                         OrderAmountAnalyzer()], fetch_size, workers=workers)
@@ -1,6 +1,5 @@
-from data_processing import open_database, calculate_some_fold
+from data_processing import open_database, calculate_some_fold, get_strip_layers
 from visualization import visualize_layers
-import json
 
 
 def random_simple_foldable(strip: str):
@@ -15,17 +14,12 @@ def random_simple_foldable(strip: str):
     # for strip, s in data.iteritems():
     #     print(strip)
     #     print(s)
-    cur.execute(f'SELECT layers FROM strips WHERE strip_name="{strip}"')
-    data = cur.fetchall()
-    if len(data) > 1:
-        raise Exception(f'Too many values: {len(data)}, expected 1 or 0')
-    elif len(data) == 0:
+    data = get_strip_layers(cur, strip)
+    if data is None:
         print('Strip not in database')
         print('Calulating...')
         calculate_some_fold(strip)
-    cur.execute(f'SELECT layers FROM strips WHERE strip_name="{strip}"')
-    data = cur.fetchall()
-    data = json.loads(data[0][0])
+        data = get_strip_layers(cur, strip)
     print(f'Found data: {data}')
     order: str = ''
     for _, order_layers in data.items():
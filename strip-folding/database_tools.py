@@ -1,9 +1,20 @@
 import sqlite3
+import json
+from typing import Dict, List, Tuple, Set, Sequence
 from sqlitedict import SqliteDict
+from encoding import decode_order, encode_state, decode_state
+from order_dag import decode_order_dag, build_order_dag_from_orders
 
 
 DICT_DATABASE_PATH: str = 'output/dict_database_2.db'
 DATABASE_PATH: str = 'output/database_3.db'
+# Secondary indexes of the strips table for the columns the analyses filter on
+STRIP_INDEXES: Dict[str, str] = {
+    'strips_len': 'len, n_creases',
+    'strips_n_creases': 'n_creases, crease_direction',
+    'strips_crease_direction': 'crease_direction',
+    'strips_crease_type': 'crease_type, n_creases, crease_direction',
+}
 
 
 def open_database():
@@ -13,6 +24,8 @@ def open_database():
     """
     con = sqlite3.connect(DATABASE_PATH)
     cur = con.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='strips'")
+    new_database: bool = cur.fetchone() is None
     cur.execute('''CREATE TABLE IF NOT EXISTS strips
                    (strip_name text, 
                    len INTEGER, 
@@ -22,20 +35,413 @@ def open_database():
                    crease_direction INTEGER,
                    layers text)'''
                 )
+    cur.execute('''CREATE TABLE IF NOT EXISTS progress
+                   (len INTEGER,
+                   creases INTEGER,
+                   symmetry_reduced INTEGER,
+                   PRIMARY KEY (len, creases, symmetry_reduced))'''
+                )
+    if new_database:
+        cur.execute('CREATE UNIQUE INDEX strips_strip_name ON strips(strip_name)')
+    __add_missing_columns(cur, {'n_orders': 'INTEGER',
+                                'n_states': 'INTEGER',
+                                'n_faces': 'INTEGER',
+                                'crease_type': 'INTEGER',
+                                'max_layer_depth': 'INTEGER',
+                                'orders_indexed': 'INTEGER'})
+    cur.execute('''CREATE TABLE IF NOT EXISTS states
+                   (strip_name text,
+                   state_id INTEGER,
+                   layers text,
+                   PRIMARY KEY (strip_name, state_id))'''
+                )
+    cur.execute('''CREATE TABLE IF NOT EXISTS order_dags
+                   (strip_name text PRIMARY KEY,
+                   dag blob)'''
+                )
+    cur.execute('''CREATE TABLE IF NOT EXISTS order_strips
+                   (fold_order blob,
+                   strip_id INTEGER,
+                   PRIMARY KEY (fold_order, strip_id)) WITHOUT ROWID'''
+                )
+    cur.execute('CREATE INDEX IF NOT EXISTS order_strips_strip_id ON order_strips(strip_id)')
+    create_strip_indexes(cur)
     return con, cur
 
 
-def insert_data(data, cursor):
+def open_read_only_database():
+    """
+    Open a read-only connection to an existing database, such that several processes can read it concurrently.
+
+    :return: connection and cursor of the SQLite database
+    """
+    con = sqlite3.connect(f'file:{DATABASE_PATH}?mode=ro', uri=True)
+    return con, con.cursor()
+
+
+def create_strip_indexes(cursor):
+    """
+    Create the secondary indexes of the strips table which do not exist yet.
+
+    :param cursor: cursor of the SQLite database
+    :return:
+    """
+    for name, columns in STRIP_INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON strips({columns})')
+    cursor.connection.commit()
+
+
+def drop_strip_indexes(cursor):
+    """
+    Drop the secondary indexes of the strips table, such that a bulk load does not have to maintain them.
+    The unique index on strip names is kept, inserts depend on it to replace existing strips.
+
+    :param cursor: cursor of the SQLite database
+    :return:
+    """
+    for name in STRIP_INDEXES:
+        cursor.execute(f'DROP INDEX IF EXISTS {name}')
+    cursor.connection.commit()
+
+
+class StripWriter:
+    """
+    Buffers strips and progress markers and inserts them with executemany in one transaction per batch.
+    The database is put in WAL mode with relaxed synchronization for the load
+    and the secondary indexes are only created again when the writer is closed.
+    """
+    def __init__(self, connection, batch_size: int = 1000):
+        """
+        :param connection: connection to the SQLite database
+        :param batch_size: amount of strips after which the buffer is written
+        """
+        if batch_size < 1:
+            raise ValueError('Invalid batch size')
+        self._connection = connection
+        self._batch_size: int = batch_size
+        self._strips: List[Tuple] = []
+        self._finished: List[Tuple[int, int, bool]] = []
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        drop_strip_indexes(connection.cursor())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def add(self, strips: List[Tuple], finished: List[Tuple[int, int, bool]] = ()):
+        """
+        Buffer strips in the format of insert_strips and the (length, creases, symmetry_reduced) which they complete.
+
+        :param strips: list of (data, states, dag)
+        :param finished: the (length, creases, symmetry_reduced) to mark as done together with the strips
+        :return:
+        """
+        self._strips.extend(strips)
+        self._finished.extend(finished)
+        if len(self._strips) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered strips and progress markers in one transaction.
+
+        :return:
+        """
+        if len(self._strips) == 0 and len(self._finished) == 0:
+            return
+        with self._connection:
+            cursor = self._connection.cursor()
+            insert_strips(self._strips, cursor)
+            mark_progress(self._finished, cursor)
+        self._strips, self._finished = [], []
+
+    def close(self):
+        """
+        Write the remaining strips, create the secondary indexes and restore full synchronization.
+
+        :return:
+        """
+        self.flush()
+        create_strip_indexes(self._connection.cursor())
+        self._connection.execute('PRAGMA synchronous=FULL')
+
+
+def __add_missing_columns(cursor, columns: Dict[str, str]):
+    """
+    Add columns to the strips table of databases created before they existed.
+
+    :param cursor: cursor of the SQLite database
+    :param columns: dictionary from column name to column type
+    :return:
+    """
+    cursor.execute('PRAGMA table_info(strips)')
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    for column, column_type in columns.items():
+        if column not in existing_columns:
+            cursor.execute(f'ALTER TABLE strips ADD COLUMN {column} {column_type}')
+
+
+def remove_duplicate_strips(cursor) -> bool:
+    """
+    Migrate databases created before strips were unique: remove the duplicate strips left by older runs and create
+    the unique index on strip names, which inserts depend on to replace existing strips.
+    New databases are created with the index, such that this only changes a database once.
+
+    :param cursor: cursor of the SQLite database
+    :return: boolean whether the database was migrated
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='strips_strip_name'")
+    if cursor.fetchone() is not None:
+        return False
+    with cursor.connection:
+        cursor.execute('DELETE FROM strips WHERE rowid NOT IN (SELECT MIN(rowid) FROM strips GROUP BY strip_name)')
+        cursor.execute('CREATE UNIQUE INDEX strips_strip_name ON strips(strip_name)')
+    return True
+
+
+def insert_strips(strips, cursor):
+    """
+    Insert the given strips with their distinct folded states and the graph of their valid orders.
+    The layers column of these strips is left empty.
+    Strips which are already in the database are replaced.
+
+    :param strips: list of (data, states, dag) with data the tuple (strip_name, len, n_creases, M_creases,
+                   creases, crease_direction, n_orders, n_states, n_faces, crease_type, max_layer_depth),
+                   states a list of states encoded by encode_state and dag the OrderDag of the strip encoded by
+                   OrderDag.encode, of which the state ids are indices in states
+    :param cursor: cursor of the SQLite database
+    :return:
+    """
+    strip_names = [(data[0],) for data, _, _ in strips]
+    cursor.executemany('DELETE FROM states WHERE strip_name=?', strip_names)
+    cursor.executemany('INSERT OR REPLACE INTO strips(strip_name, len, n_creases, M_creases, creases, crease_direction, '
+                       'n_orders, n_states, n_faces, crease_type, max_layer_depth) '
+                       'VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       [data for data, _, _ in strips])
+    cursor.executemany('INSERT INTO states(strip_name, state_id, layers) VALUES(?, ?, ?)',
+                       [(data[0], state_id, state)
+                        for data, states, _ in strips for state_id, state in enumerate(states)])
+    cursor.executemany('INSERT OR REPLACE INTO order_dags(strip_name, dag) VALUES(?, ?)',
+                       [(data[0], dag) for data, _, dag in strips])
+
+
+def split_layers(layers: Dict[str, Dict[str, str]]) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """
+    Split a layer dictionary into its distinct folded states and the state of each order.
+
+    :param layers: layer dictionary { coordinate: { order: layers } }
+    :return: list of states { coordinate: layers } and dictionary from order to the index of its state
+    """
+    order_states: Dict[str, Dict[str, str]] = {}
+    for coordinate, order_layers in layers.items():
+        for order, layer in order_layers.items():
+            order_states.setdefault(order, {})[coordinate] = layer
+    states: List[Dict[str, str]] = []
+    state_ids: Dict[frozenset, int] = {}
+    orders: Dict[str, int] = {}
+    for order, state in order_states.items():
+        key: frozenset = frozenset(state.items())
+        if key not in state_ids:
+            state_ids[key] = len(states)
+            states.append(state)
+        orders[order] = state_ids[key]
+    return states, orders
+
+
+def join_states(states, orders: Dict[str, int]) -> Dict[str, Dict[str, str]]:
+    """
+    Construct a layer dictionary from folded states and the state of each order, the inverse of split_layers.
+
+    :param states: states { coordinate: layers } indexable by state id
+    :param orders: dictionary from order to its state id
+    :return: layer dictionary { coordinate: { order: layers } }
+    """
+    layers: Dict[str, Dict[str, str]] = {}
+    for order, state_id in orders.items():
+        for coordinate, layer in states[state_id].items():
+            layers.setdefault(coordinate, {})[order] = layer
+    return layers
+
+
+def load_layers(connection, strip_name: str, layers) -> Dict[str, Dict[str, str]]:
+    """
+    Get the layer dictionary of a strip row.
+    Older rows store it in the layers column, otherwise it is joined from the binary encoded states and the order
+    graph of the strip.
+
+    :param connection: connection to the SQLite database
+    :param strip_name: strip string of the row
+    :param layers: value of the layers column of the row
+    :return: layer dictionary { coordinate: { order: layers } }
+    """
+    if layers is not None:
+        return json.loads(layers)
+    cursor = connection.cursor()
+    cursor.execute('SELECT state_id, layers FROM states WHERE strip_name=?', (strip_name,))
+    states = {state_id: decode_state(state) for state_id, state in cursor.fetchall()}
+    return join_states(states, __load_order_states(cursor, strip_name))
+
+
+def load_states(connection, strip_name: str, layers) -> List[Dict[str, str]]:
+    """
+    Get the distinct folded states of a strip row without joining them with its orders.
+
+    :param connection: connection to the SQLite database
+    :param strip_name: strip string of the row
+    :param layers: value of the layers column of the row
+    :return: list of states { coordinate: layers }
+    """
+    if layers is not None:
+        return split_layers(json.loads(layers))[0]
+    cursor = connection.cursor()
+    cursor.execute('SELECT layers FROM states WHERE strip_name=? ORDER BY state_id', (strip_name,))
+    return [decode_state(state) for state, in cursor.fetchall()]
+
+
+def load_orders(connection, strip_name: str, layers) -> Set[str]:
+    """
+    Get the non-empty orders of a strip row without loading its folded states.
+
+    :param connection: connection to the SQLite database
+    :param strip_name: strip string of the row
+    :param layers: value of the layers column of the row
+    :return: set of order strings
+    """
+    if layers is not None:
+        return {order for order in next(iter(json.loads(layers).values()), {}) if order}
+    orders: Set[str] = set(load_order_states(connection, strip_name))
+    orders.discard('')
+    return orders
+
+
+def load_order_states(connection, strip_name: str) -> Dict[str, int]:
+    """
+    Get the state id of every order of a strip stored without layers column, the state ids are indices in
+    the list returned by load_states.
+
+    :param connection: connection to the SQLite database
+    :param strip_name: strip string
+    :return: dictionary from order string to state id
+    """
+    return __load_order_states(connection.cursor(), strip_name)
+
+
+def __load_order_states(cursor, strip_name: str) -> Dict[str, int]:
+    """
+    Get the state id of every order of a strip from its order graph.
+
+    :param cursor: cursor of the SQLite database
+    :param strip_name: strip string
+    :return: dictionary from order string to state id
+    """
+    cursor.execute('SELECT dag FROM order_dags WHERE strip_name=?', (strip_name,))
+    row = cursor.fetchone()
+    return {} if row is None else decode_order_dag(row[0]).get_orders()
+
+
+def get_indexed_orders(cursor, strip_ids: Sequence[int]) -> Dict[int, Set[str]]:
+    """
+    Get the non-empty orders of strips from the order index, without loading their layers.
+
+    :param cursor: cursor of the SQLite database
+    :param strip_ids: strip IDs, see rank_strip
+    :return: dictionary from strip ID to its set of order strings
+    """
+    orders: Dict[int, Set[str]] = {strip_id: set() for strip_id in strip_ids}
+    __select_strip_ids(cursor, strip_ids)
+    cursor.execute('SELECT strip_id, fold_order FROM order_strips '
+                   'WHERE strip_id IN (SELECT strip_id FROM selected_strips)')
+    for strip_id, order in cursor.fetchall():
+        orders[strip_id].add('|'.join(map(str, decode_order(order))))
+    return orders
+
+
+def get_common_orders(cursor, strip_ids: Sequence[int]) -> Set[str]:
+    """
+    Get the orders which are accepted by all given strips, intersected by the database using the order index.
+
+    :param cursor: cursor of the SQLite database
+    :param strip_ids: strip IDs, see rank_strip
+    :return: set of order strings
+    """
+    __select_strip_ids(cursor, strip_ids)
+    cursor.execute('SELECT fold_order FROM order_strips WHERE strip_id IN (SELECT strip_id FROM selected_strips) '
+                   'GROUP BY fold_order HAVING COUNT(*) = ?', (len(set(strip_ids)),))
+    return {'|'.join(map(str, decode_order(order))) for order, in cursor.fetchall()}
+
+
+def __select_strip_ids(cursor, strip_ids: Sequence[int]):
+    """
+    Fill the temporary table of strip IDs which the order index queries join on.
+
+    :param cursor: cursor of the SQLite database
+    :param strip_ids: strip IDs
+    :return:
+    """
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS selected_strips (strip_id INTEGER PRIMARY KEY)')
+    cursor.execute('DELETE FROM selected_strips')
+    cursor.executemany('INSERT OR IGNORE INTO selected_strips(strip_id) VALUES(?)',
+                       [(strip_id,) for strip_id in strip_ids])
+
+
+def normalize_database(connection, batch_size: int = 1000):
+    """
+    Move the layers column of older rows into the states table and order graphs and compact the database file.
+
+    :param connection: connection to the SQLite database
+    :param batch_size: amount of strips moved per transaction
+    :return:
+    """
+    cursor = connection.cursor()
+    while True:
+        cursor.execute('SELECT strip_name, layers FROM strips WHERE layers IS NOT NULL LIMIT ?', (batch_size,))
+        rows = cursor.fetchall()
+        if len(rows) == 0:
+            break
+        with connection:
+            for strip_name, layers in rows:
+                states, orders = split_layers(json.loads(layers))
+                cursor.execute('DELETE FROM states WHERE strip_name=?', (strip_name,))
+                cursor.executemany('INSERT INTO states(strip_name, state_id, layers) VALUES(?, ?, ?)',
+                                   [(strip_name, state_id, encode_state(state))
+                                    for state_id, state in enumerate(states)])
+                cursor.execute('INSERT OR REPLACE INTO order_dags(strip_name, dag) VALUES(?, ?)',
+                               (strip_name, build_order_dag_from_orders(orders).encode()))
+                cursor.execute('UPDATE strips SET layers = NULL, n_states = ? WHERE strip_name = ?',
+                               (len(states), strip_name))
+    connection.execute('VACUUM')
+
+
+def get_progress(cursor, symmetry_reduced: bool = False):
+    """
+    Get the lengths and creases of which all strips are in the database.
+    A run with all strips also completes a symmetry reduced run, but not the other way around.
+
+    :param cursor: cursor of the SQLite database
+    :param symmetry_reduced: whether the run only needs the representative of each symmetry class
+    :return: set of (length, creases)
+    """
+    if symmetry_reduced:
+        cursor.execute('SELECT len, creases FROM progress')
+    else:
+        cursor.execute('SELECT len, creases FROM progress WHERE symmetry_reduced = 0')
+    return set(cursor.fetchall())
+
+
+def mark_progress(finished, cursor):
     """
-    Insert the given data into the SQLite database.
+    Mark the given lengths and creases as done.
 
-    :param data: tuple of data
+    :param finished: list of (length, creases, symmetry_reduced)
     :param cursor: cursor of the SQLite database
     :return:
     """
-    sql = 'INSERT INTO strips(strip_name, len, n_creases, M_creases, creases, crease_direction, layers) ' \
-          'VALUES(?, ?, ?, ?, ?, ?, ?)'
-    cursor.execute(sql, data)
+    cursor.executemany('INSERT OR REPLACE INTO progress(len, creases, symmetry_reduced) VALUES(?, ?, ?)',
+                       [(length, creases, int(symmetry_reduced)) for length, creases, symmetry_reduced in finished])
 
 
 def open_dict_database():
@@ -0,0 +1,124 @@
+from array import array
+from typing import Dict, List, Sequence
+
+
+def parse_order(order: str) -> List[int]:
+    """
+    Parse an order string like '3|0|2|1' as it is used as key in the layer dictionaries.
+
+    :param order: order string, empty for the strip without creases
+    :return: list of crease indices
+    """
+    return [int(crease) for crease in order.split('|')] if order else []
+
+
+def rank_order(order: Sequence[int]) -> int:
+    """
+    Get the rank of a fold order among all permutations of its creases using its Lehmer code.
+
+    :param order: permutation of 0 .. len(order) - 1
+    :return: rank between 0 and len(order)! - 1
+    """
+    remaining: List[int] = list(range(len(order)))
+    rank: int = 0
+    for i, crease in enumerate(order):
+        index: int = remaining.index(crease)
+        rank = rank * (len(order) - i) + index
+        remaining.pop(index)
+    return rank
+
+
+def unrank_order(rank: int, length: int) -> List[int]:
+    """
+    Get the fold order with the given rank, the inverse of rank_order.
+
+    :param rank: rank of the order
+    :param length: amount of creases in the order
+    :return: permutation of 0 .. length - 1
+    """
+    digits: List[int] = []
+    for base in range(1, length + 1):
+        rank, digit = divmod(rank, base)
+        digits.append(digit)
+    remaining: List[int] = list(range(length))
+    return [remaining.pop(digit) for digit in reversed(digits)]
+
+
+def encode_order(order: Sequence[int]) -> bytes:
+    """
+    Encode a fold order as its length followed by its rank.
+
+    :param order: permutation of 0 .. len(order) - 1
+    :return: encoded order
+    """
+    rank: int = rank_order(order)
+    return bytes((len(order),)) + rank.to_bytes((rank.bit_length() + 7) // 8, 'little')
+
+
+def decode_order(data: bytes) -> List[int]:
+    """
+    Decode an order encoded by encode_order.
+
+    :param data: encoded order
+    :return: list of crease indices
+    """
+    view: memoryview = memoryview(data)
+    return unrank_order(int.from_bytes(view[1:], 'little'), view[0])
+
+
+def pack_ints(values: Sequence[int]) -> bytes:
+    """
+    Pack small integers as a typecode byte followed by an array of bytes, shorts or ints, the smallest which fits.
+
+    :param values: integers between -2^31 and 2^31 - 1
+    :return: packed integers
+    """
+    low: int = min(values, default=0)
+    high: int = max(values, default=0)
+    typecode: str = 'b' if -2 ** 7 <= low and high < 2 ** 7 else 'h' if -2 ** 15 <= low and high < 2 ** 15 else 'i'
+    return typecode.encode() + array(typecode, values).tobytes()
+
+
+def unpack_ints(data: bytes) -> memoryview:
+    """
+    Get a view on integers packed by pack_ints without copying them.
+
+    :param data: packed integers
+    :return: view of the integers
+    """
+    view: memoryview = memoryview(data)
+    return view[1:].cast(chr(view[0]))
+
+
+def encode_state(state: Dict[str, str]) -> bytes:
+    """
+    Encode a folded state { coordinate: layers } as packed integers h, n, s, stack size, faces per coordinate.
+    The coordinates are sorted, such that equal states have equal encodings.
+
+    :param state: folded state with coordinates and layers in string representation
+    :return: encoded state
+    """
+    values: array = array('h')
+    for coordinate, layers in sorted(state.items()):
+        faces: List[str] = layers.split('|')
+        values.extend(int(value) for value in coordinate.split('|'))
+        values.append(len(faces))
+        values.extend(int(face) for face in faces)
+    return pack_ints(values)
+
+
+def decode_state(data: bytes) -> Dict[str, str]:
+    """
+    Decode a state encoded by encode_state.
+
+    :param data: encoded state
+    :return: folded state with coordinates and layers in string representation
+    """
+    values: memoryview = unpack_ints(data)
+    state: Dict[str, str] = {}
+    i: int = 0
+    while i < len(values):
+        size: int = values[i + 3]
+        state[f'{values[i]}|{values[i + 1]}|{values[i + 2]}'] = '|'.join(map(str, values[i + 4:i + 4 + size]))
+        i += 4 + size
+    return state
@@ -15,6 +15,6 @@ def brute_force_simple_folds():
                 for face_length in str(strip_lengths):
                     faces.append(Face(face_length))
                 strip: Strip = Strip(faces, creases)
-                print(strip.is_simple_foldable())
+                print(strip.has_simple_fold())
 
     strip: Strip = Strip()
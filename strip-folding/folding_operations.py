@@ -1,5 +1,6 @@
-from typing import Tuple
+from typing import Tuple, Dict
 from enum import Enum
+import numpy as np
 
 
 class FoldabilityError(Exception):
@@ -161,3 +162,104 @@ def coordinate_folds_up(coordinate: Tuple[int, int, int],
             raise Exception('Invalid face direction: {}'.format(face_direction))
     else:
         raise Exception('Invalid crease direction: {}'.format(crease_direction))
+
+
+# Folding a coordinate around a global fold line of some index is an affine map: M @ coordinate + index * b
+FOLD_MATRICES: Dict[Direction, Tuple[np.ndarray, np.ndarray]] = {
+    Direction.H: (np.array([[-1, 0, 0], [0, 0, 1], [0, 1, 0]]), np.array([2, -1, 1])),
+    Direction.N: (np.array([[0, 0, 1], [0, -1, 0], [1, 0, 0]]), np.array([-1, 2, 1])),
+    Direction.S: (np.array([[0, -1, 0], [-1, 0, 0], [0, 0, -1]]), np.array([1, 1, 2])),
+}
+
+# For a crease direction and face direction: does a coordinate fold up exactly when
+# (coordinate greater than crease) equals (crease is a mountain fold)
+FOLDS_UP_IF_EQUAL: Dict[Tuple[Direction, Direction], bool] = {
+    (Direction.H, Direction.N): True,
+    (Direction.H, Direction.S): False,
+    (Direction.N, Direction.H): False,
+    (Direction.N, Direction.S): True,
+    (Direction.S, Direction.H): False,
+    (Direction.S, Direction.N): True,
+}
+
+
+def are_upside_down(triangles: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of is_upside_down.
+
+    :param triangles: (N, 3) array of triangle coordinates
+    :return: boolean array whether each triangle is upside down
+    """
+    difference: np.ndarray = triangles[:, 2] - triangles[:, 1]
+    if np.any(difference == triangles[:, 0]):
+        raise ValueError
+    return difference < triangles[:, 0]
+
+
+def transform_coordinates(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of transform_coordinate.
+
+    :param coordinates: (N, 3) array of coordinates in global fold line coordinate system
+    :return: (N, 2) array of 2d x,y coordinates
+    """
+    transformed: np.ndarray = np.empty((len(coordinates), 2), dtype=coordinates.dtype)
+    transformed[:, 0] = coordinates[:, 1] + coordinates[:, 2] - 1
+    transformed[:, 1] = coordinates[:, 0] - are_upside_down(coordinates)
+    return transformed
+
+
+def fold_coordinates(coordinates: np.ndarray, direction: Direction, index: int) -> np.ndarray:
+    """
+    Vectorized version of fold_coordinate.
+
+    :param coordinates: (N, 3) array of coordinates to fold
+    :param direction: The direction of the global fold line
+    :param index: The index of the global fold line
+    :return: (N, 3) array of the coordinates of the folded triangles
+    """
+    if direction not in FOLD_MATRICES:
+        raise Exception('Incorrect crease direction: {}'.format(direction))
+    matrix, offset = FOLD_MATRICES[direction]
+    return coordinates @ matrix.T + index * offset
+
+
+def coordinates_greater_than_crease(coordinates: np.ndarray, global_crease: Tuple[Direction, int]) -> np.ndarray:
+    """
+    Vectorized version of coordinate_greater_than_crease.
+
+    :param coordinates: (N, 3) array of coordinates
+    :param global_crease: Given the crease as a direction and index
+    :return: boolean array whether each coordinate is greater than the given crease
+    """
+    crease_direction, crease_index = global_crease
+    h, n, s = coordinates[:, 0], coordinates[:, 1], coordinates[:, 2]
+    if crease_direction == Direction.H:
+        return np.where(h != crease_index, h > crease_index, s - n > crease_index)
+    elif crease_direction == Direction.N:
+        return np.where(n != crease_index, n > crease_index, s - h > crease_index)
+    elif crease_direction == Direction.S:
+        return np.where(s != crease_index, s > crease_index, h + n > crease_index)
+    else:
+        raise Exception('Invalid crease direction: {}'.format(crease_direction))
+
+
+def coordinates_fold_up(coordinates: np.ndarray,
+                        global_crease: Tuple[Direction, int],
+                        is_mountain_fold: bool,
+                        face_direction: Direction) -> np.ndarray:
+    """
+    Vectorized version of coordinate_folds_up.
+
+    :param coordinates: (N, 3) array of coordinates
+    :param global_crease: the global crease
+    :param is_mountain_fold: boolean whether global_crease is a mountain or valley fold
+    :param face_direction: the direction of the face of the global crease
+    :return: boolean array whether each coordinate folds up
+    """
+    if (global_crease[0], face_direction) not in FOLDS_UP_IF_EQUAL:
+        raise Exception('Invalid face direction: {}'.format(face_direction))
+    cgc: np.ndarray = coordinates_greater_than_crease(coordinates, global_crease)
+    if FOLDS_UP_IF_EQUAL[(global_crease[0], face_direction)]:
+        return cgc == is_mountain_fold
+    return cgc != is_mountain_fold
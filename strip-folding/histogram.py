@@ -0,0 +1,193 @@
+from typing import Tuple, List
+import numpy as np
+import os
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcl
+
+
+HISTOGRAM_PATH: str = 'output/histograms'
+
+
+class Histogram2D:
+    """
+    2D histogram with a fixed amount of equally wide bins per axis, which is filled in chunks while streaming over
+    the strips, such that the values themselves are never kept.
+    The bins of an axis start at a fixed value, when a value does not fit the bin width is doubled by merging
+    pairs of bins. The bins thus only depend on the largest value, not on the order in which values are added
+    or histograms of different workers are merged.
+    """
+    def __init__(self, n_bins: Tuple[int, int], starts: Tuple[float, float], widths: Tuple[float, float],
+                 chunk_size: int = 10000):
+        """
+        :param n_bins: amount of bins of the x and y axis
+        :param starts: lower edge of the first bin of the x and y axis
+        :param widths: initial bin width of the x and y axis
+        :param chunk_size: amount of values buffered by add before they are binned
+        """
+        if min(n_bins) < 1 or min(widths) <= 0:
+            raise ValueError('Invalid bins')
+        self._counts: np.ndarray = np.zeros(n_bins, dtype=np.int64)
+        self._starts: Tuple[float, float] = starts
+        self._widths: List[float] = list(widths)
+        self._chunk_size: int = chunk_size
+        self._x: List[float] = []
+        self._y: List[float] = []
+
+    def get_counts(self) -> np.ndarray:
+        self.flush()
+        return self._counts
+
+    def set_counts(self, counts: np.ndarray):
+        self.flush()
+        if counts.shape != self._counts.shape:
+            raise ValueError('Invalid counts')
+        self._counts = counts.astype(np.int64)
+
+    def get_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the bin edges of both axes.
+
+        :return: x and y edges, one more than the amount of bins
+        """
+        self.flush()
+        return tuple(start + width * np.arange(n_bins + 1)
+                     for start, width, n_bins in zip(self._starts, self._widths, self._counts.shape))
+
+    def add(self, x: float, y: float):
+        """
+        Add a single value, which is binned with the next chunk.
+
+        :param x: x value
+        :param y: y value
+        :return:
+        """
+        self._x.append(x)
+        self._y.append(y)
+        if len(self._x) >= self._chunk_size:
+            self.flush()
+
+    def add_chunk(self, x: np.ndarray, y: np.ndarray):
+        """
+        Bin a chunk of values, which are counted as amounts or fractions and can thus not be negative.
+        Missing values (None or NaN) and values below the start of an axis are rejected, instead of being counted
+        in its first bin.
+
+        :param x: x values
+        :param y: y values of the same length
+        :return:
+        """
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        if x.shape != y.shape:
+            raise ValueError('Chunks of different lengths')
+        if len(x) == 0:
+            return
+        for axis, values in enumerate((x, y)):
+            if np.isnan(values).any() or values.min() < max(self._starts[axis], 0):
+                raise ValueError('Missing or negative values')
+        for axis, values in enumerate((x, y)):
+            while values.max() >= self._starts[axis] + self._widths[axis] * self._counts.shape[axis]:
+                self.__double_width(axis)
+        indices: List[np.ndarray] = [np.minimum(((values - start) // width).astype(np.int64), n_bins - 1)
+                                     for values, start, width, n_bins
+                                     in zip((x, y), self._starts, self._widths, self._counts.shape)]
+        self._counts += np.bincount(indices[0] * self._counts.shape[1] + indices[1],
+                                    minlength=self._counts.size).reshape(self._counts.shape)
+
+    def flush(self):
+        """
+        Bin the values buffered by add.
+
+        :return:
+        """
+        x, y = self._x, self._y
+        self._x, self._y = [], []
+        self.add_chunk(np.array(x), np.array(y))
+
+    def merge(self, other: 'Histogram2D'):
+        """
+        Add the counts of a histogram with the same amount of bins and starts, filled with other values.
+
+        :param other: histogram of which the bin widths differ by a power of two at most
+        :return:
+        """
+        self.flush()
+        counts: np.ndarray = other.get_counts()
+        if counts.shape != self._counts.shape or tuple(self._starts) != tuple(other._starts):
+            raise ValueError('Histograms with different bins')
+        for axis in range(2):
+            ratio: float = max(self._widths[axis], other._widths[axis]) / min(self._widths[axis], other._widths[axis])
+            if ratio != 2 ** round(np.log2(ratio)):
+                raise ValueError('Histograms with different bins')
+            while self._widths[axis] < other._widths[axis]:
+                self.__double_width(axis)
+            # The counts of the other histogram are merged on a copy, the other histogram itself is not changed
+            width: float = other._widths[axis]
+            while width < self._widths[axis]:
+                counts = self.__merge_bin_pairs(counts, axis)
+                width *= 2
+        self._counts += counts
+
+    def save(self, name: str, directory: str = HISTOGRAM_PATH):
+        """
+        Write the counts and the bins to .npy files, see load_histogram.
+
+        :param name: name of the histogram
+        :param directory: directory of the histogram files
+        :return:
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f'{name}.npy'), self.get_counts())
+        np.save(os.path.join(directory, f'{name}_bins.npy'), np.array(list(self._starts) + self._widths))
+
+    def plot(self, x_label: str, y_label: str):
+        """
+        Plot the counts on a logarithmic color scale, empty bins are white.
+
+        :param x_label: label of the x axis
+        :param y_label: label of the y axis
+        :return:
+        """
+        my_cmap = plt.cm.get_cmap('jet').copy()
+        my_cmap.set_bad('w')
+        x_edges, y_edges = self.get_edges()
+        plt.figure()
+        plt.pcolormesh(x_edges, y_edges, np.ma.masked_less(self.get_counts(), 1).T, norm=mcl.LogNorm(), cmap=my_cmap)
+        plt.colorbar()
+        plt.xlabel(x_label)
+        plt.ylabel(y_label)
+
+    def __double_width(self, axis: int):
+        self._counts = self.__merge_bin_pairs(self._counts, axis)
+        self._widths[axis] *= 2
+
+    @staticmethod
+    def __merge_bin_pairs(counts: np.ndarray, axis: int) -> np.ndarray:
+        """
+        Add each pair of neighbouring bins of an axis and fill the upper half of the axis with empty bins.
+
+        :param counts: counts of the histogram
+        :param axis: axis of which the bins are merged
+        :return: new counts with the same shape
+        """
+        counts = np.moveaxis(counts, axis, 0)
+        n_bins: int = counts.shape[0]
+        padded: np.ndarray = np.concatenate((counts, np.zeros((n_bins % 2,) + counts.shape[1:], dtype=counts.dtype)))
+        merged: np.ndarray = np.zeros_like(counts)
+        merged[:(n_bins + 1) // 2] = padded[0::2] + padded[1::2]
+        return np.moveaxis(merged, 0, axis)
+
+
+def load_histogram(name: str, directory: str = HISTOGRAM_PATH) -> Histogram2D:
+    """
+    Read a histogram written by Histogram2D.save, for rendering it without scanning the database again.
+
+    :param name: name of the histogram
+    :param directory: directory of the histogram files
+    :return: the histogram
+    """
+    counts: np.ndarray = np.load(os.path.join(directory, f'{name}.npy'))
+    bins: np.ndarray = np.load(os.path.join(directory, f'{name}_bins.npy'))
+    histogram: Histogram2D = Histogram2D(counts.shape, (float(bins[0]), float(bins[1])),
+                                         (float(bins[2]), float(bins[3])))
+    histogram.set_counts(counts)
+    return histogram
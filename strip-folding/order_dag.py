@@ -0,0 +1,328 @@
+from typing import List, Dict, Tuple, Optional, Iterator, Sequence, Set
+from encoding import pack_ints, unpack_ints, encode_state, parse_order
+
+
+class OrderDag:
+    """
+    The valid fold orders of a strip as a directed acyclic graph with an edge per folded crease.
+    Orders with a common prefix share their path from the root. After minimize, nodes from which the same
+    completions lead to the same folded states are a single node, so orders also share their common suffixes.
+    Node 0 is the root and every edge leads to a node with a larger index.
+    A node with a state id is a completely folded strip, the path to it is a valid order.
+    """
+    def __init__(self, children: List[List[Tuple[int, int]]], state_ids: List[int]):
+        """
+        :param children: per node the list of (crease, child node)
+        :param state_ids: per node the id of its folded state, or -1 if the strip is not completely folded
+        """
+        self._children: List[List[Tuple[int, int]]] = children
+        self._state_ids: List[int] = state_ids
+        self._counts: Optional[List[int]] = None
+
+    def get_node_amount(self) -> int:
+        return len(self._children)
+
+    def minimize(self) -> 'OrderDag':
+        """
+        Merge the nodes with equal completions, by hash-consing the nodes bottom-up: a node is replaced by the first
+        node with the same state id and the same (crease, child) edges, after its children are replaced.
+        The result does not depend on which equal nodes the search happened to share.
+
+        :return: the minimal graph with the same orders and state ids
+        """
+        n_nodes: int = len(self._children)
+        canonical: List[int] = list(range(n_nodes))
+        unique: Dict[Tuple, int] = {}
+        # Every edge leads to a larger index, so the children of a node are replaced before the node itself
+        for i in range(n_nodes - 1, -1, -1):
+            key: Tuple = (self._state_ids[i], tuple(sorted((crease, canonical[child])
+                                                           for crease, child in self._children[i])))
+            canonical[i] = unique.setdefault(key, i)
+        # Renumber the nodes reachable from the root, keeping their order such that edges lead to larger indices
+        reachable: Set[int] = {canonical[0]}
+        stack: List[int] = [canonical[0]]
+        while len(stack) > 0:
+            for _, child in self._children[stack.pop()]:
+                if canonical[child] not in reachable:
+                    reachable.add(canonical[child])
+                    stack.append(canonical[child])
+        nodes: List[int] = sorted(reachable)
+        indices: Dict[int, int] = {node: index for index, node in enumerate(nodes)}
+        return OrderDag([[(crease, indices[canonical[child]]) for crease, child in self._children[node]]
+                         for node in nodes], [self._state_ids[node] for node in nodes])
+
+    def is_foldable(self) -> bool:
+        return self.count_orders() > 0
+
+    def get_node(self, prefix: Sequence[int]) -> Optional[int]:
+        """
+        Get the node reached by folding the creases of a prefix.
+
+        :param prefix: creases in folding order
+        :return: node index, or None if the prefix is not the start of a valid order
+        """
+        node: int = 0
+        for crease in prefix:
+            for child_crease, child in self._children[node]:
+                if child_crease == crease:
+                    node = child
+                    break
+            else:
+                return None
+        return node
+
+    def count_orders(self, prefix: Sequence[int] = ()) -> int:
+        """
+        Count the valid orders starting with a prefix, without expanding them.
+
+        :param prefix: creases in folding order
+        :return: amount of valid orders
+        """
+        node: Optional[int] = self.get_node(prefix)
+        if node is None:
+            return 0
+        if self._counts is None:
+            counts: List[int] = [0] * len(self._children)
+            for i in range(len(self._children) - 1, -1, -1):
+                counts[i] = (self._state_ids[i] >= 0) + sum(counts[child] for _, child in self._children[i])
+            self._counts = counts
+        return self._counts[node]
+
+    def get_next_creases(self, prefix: Sequence[int] = ()) -> List[int]:
+        """
+        Get the creases which can be folded after a prefix, such that the order can still be completed.
+
+        :param prefix: creases in folding order
+        :return: list of creases
+        """
+        node: Optional[int] = self.get_node(prefix)
+        return [] if node is None else [crease for crease, _ in self._children[node]]
+
+    def get_completions(self, prefix: Sequence[int] = ()) -> Iterator[Tuple[List[int], int]]:
+        """
+        Expand the valid orders starting with a prefix.
+
+        :param prefix: creases in folding order
+        :return: generator of (order, state id), the order list is reused and has to be copied to keep it
+        """
+        node: Optional[int] = self.get_node(prefix)
+        if node is None:
+            return
+        order: List[int] = list(prefix)
+        # Depth first with an explicit stack of (node, index of the next child)
+        stack: List[List[int]] = [[node, 0]]
+        if self._state_ids[node] >= 0:
+            yield order, self._state_ids[node]
+        while len(stack) > 0:
+            top: List[int] = stack[-1]
+            children: List[Tuple[int, int]] = self._children[top[0]]
+            if top[1] == len(children):
+                stack.pop()
+                if len(stack) > 0:
+                    order.pop()
+                continue
+            crease, child = children[top[1]]
+            top[1] += 1
+            order.append(crease)
+            stack.append([child, 0])
+            if self._state_ids[child] >= 0:
+                yield order, self._state_ids[child]
+
+    def get_orders(self) -> Dict[str, int]:
+        """
+        Get all valid orders in the string representation of the layer dictionaries.
+
+        :return: dictionary from order string to its state id
+        """
+        return {'|'.join(map(str, order)): state_id for order, state_id in self.get_completions()}
+
+    def encode(self) -> bytes:
+        """
+        Encode the graph as packed integers: node amount, then per node its state id, amount of children
+        and (crease, child) per child.
+
+        :return: encoded graph
+        """
+        values: List[int] = [len(self._children)]
+        for children, state_id in zip(self._children, self._state_ids):
+            values.append(state_id)
+            values.append(len(children))
+            for crease, child in children:
+                values.append(crease)
+                values.append(child)
+        return pack_ints(values)
+
+
+def decode_order_dag(data: bytes) -> OrderDag:
+    """
+    Decode a graph encoded by OrderDag.encode.
+
+    :param data: encoded graph
+    :return: the graph
+    """
+    values = unpack_ints(data)
+    children: List[List[Tuple[int, int]]] = []
+    state_ids: List[int] = []
+    i: int = 1
+    for _ in range(values[0]):
+        state_ids.append(values[i])
+        n_children: int = values[i + 1]
+        children.append([(values[j], values[j + 1]) for j in range(i + 2, i + 2 + 2 * n_children, 2)])
+        i += 2 + 2 * n_children
+    return OrderDag(children, state_ids)
+
+
+def build_order_dag_from_orders(orders: Dict[str, int]) -> OrderDag:
+    """
+    Build the minimal graph of orders which are not given as completions of a search, such as the orders of
+    older databases. The orders are inserted in a prefix tree which is then minimised.
+
+    :param orders: dictionary from order string to its state id, the empty order for a strip without creases
+    :return: the graph
+    """
+    children: List[Dict[int, int]] = [{}]
+    state_ids: List[int] = [-1]
+    for order, state_id in orders.items():
+        node: int = 0
+        for crease in parse_order(order):
+            if crease not in children[node]:
+                # A new node is appended, such that every edge leads to a larger index
+                children[node][crease] = len(children)
+                children.append({})
+                state_ids.append(-1)
+            node = children[node][crease]
+        state_ids[node] = state_id
+    return OrderDag([sorted(node_children.items()) for node_children in children], state_ids).minimize()
+
+
+def build_order_dag(root) -> Tuple[OrderDag, List[Dict[str, str]]]:
+    """
+    Build the minimal graph of the completions found by the search, see Strip.get_order_dag.
+    The search only shares the completions of the states in its transposition table, the graph is minimised
+    afterwards such that it does not depend on the cache size of the search.
+    The states are numbered in the order in which they are first reached by expanding the orders,
+    equal states reached through different nodes get the same id.
+
+    :param root: CompletionNode of the unfolded strip
+    :return: the graph and the distinct folded states
+    """
+    # Number the nodes in reversed post-order, such that every edge leads to a larger index
+    post_order: List = []
+    visited: Set[int] = set()
+    states: List[Dict[str, str]] = []
+    state_ids: Dict[bytes, int] = {}
+    node_states: Dict[int, int] = {}
+
+    def visit(node):
+        visited.add(id(node))
+        if node.layers is not None:
+            state: bytes = encode_state(node.layers)
+            if state not in state_ids:
+                state_ids[state] = len(states)
+                states.append(node.layers)
+            node_states[id(node)] = state_ids[state]
+        for _, child in node.children:
+            if id(child) not in visited:
+                visit(child)
+        post_order.append(node)
+
+    if root.is_foldable():
+        visit(root)
+    else:
+        post_order.append(root)
+    n_nodes: int = len(post_order)
+    indices: Dict[int, int] = {id(node): n_nodes - 1 - i for i, node in enumerate(post_order)}
+    children: List[List[Tuple[int, int]]] = [[] for _ in range(n_nodes)]
+    node_state_ids: List[int] = [-1] * n_nodes
+    for node in post_order:
+        index: int = indices[id(node)]
+        children[index] = [(crease, indices[id(child)]) for crease, child in node.children]
+        node_state_ids[index] = node_states.get(id(node), -1)
+    return OrderDag(children, node_state_ids).minimize(), states
+
+
+class OrderDagBuilder:
+    """
+    Builds the minimal graph of orders which are added one by one in depth first order, such as the orders emitted
+    by Strip.all_simple_folds, without keeping all orders. Only the nodes of the last added order are unfinished,
+    once the following orders leave a node it is replaced by an equal finished node if there is one, as in the
+    incremental construction of minimal automata for sorted words.
+    """
+    def __init__(self):
+        self._children: List[List[Tuple[int, int]]] = [[]]
+        self._state_ids: List[int] = [-1]
+        self._free: List[int] = []
+        self._register: Dict[Tuple, int] = {}
+        self._path: List[int] = [0]
+        self._order: List[int] = []
+
+    def add(self, order: Sequence[int], state_id: int):
+        """
+        Add a valid order. All orders starting with a prefix have to be added before the next order which leaves it.
+
+        :param order: creases in folding order
+        :param state_id: id of the folded state of the order
+        :return:
+        """
+        common: int = 0
+        n_common: int = min(len(order), len(self._order))
+        while common < n_common and order[common] == self._order[common]:
+            common += 1
+        self.__finish(common)
+        for crease in order[common:]:
+            node: int = self.__new_node()
+            self._children[self._path[-1]].append((crease, node))
+            self._path.append(node)
+        self._state_ids[self._path[-1]] = state_id
+        self._order = list(order)
+
+    def __new_node(self) -> int:
+        if len(self._free) > 0:
+            return self._free.pop()
+        self._children.append([])
+        self._state_ids.append(-1)
+        return len(self._children) - 1
+
+    def __finish(self, depth: int):
+        """
+        Finish the nodes of the last order below the given depth, replacing them by equal finished nodes.
+
+        :param depth: length of the prefix whose nodes stay unfinished
+        :return:
+        """
+        while len(self._path) > depth + 1:
+            node: int = self._path.pop()
+            key: Tuple = (self._state_ids[node], tuple(self._children[node]))
+            registered: int = self._register.setdefault(key, node)
+            if registered != node:
+                parent_children: List[Tuple[int, int]] = self._children[self._path[-1]]
+                parent_children[-1] = (parent_children[-1][0], registered)
+                self._children[node] = []
+                self._state_ids[node] = -1
+                self._free.append(node)
+
+    def get_order_dag(self) -> OrderDag:
+        """
+        Finish all nodes and number them such that the root is 0 and every edge leads to a larger index.
+
+        :return: the graph of the added orders
+        """
+        self.__finish(0)
+        # Reversed post-order of the nodes reachable from the root, with an explicit stack of (node, next child)
+        post_order: List[int] = []
+        visited: Set[int] = {0}
+        stack: List[List[int]] = [[0, 0]]
+        while len(stack) > 0:
+            top: List[int] = stack[-1]
+            if top[1] == len(self._children[top[0]]):
+                post_order.append(stack.pop()[0])
+                continue
+            child: int = self._children[top[0]][top[1]][1]
+            top[1] += 1
+            if child not in visited:
+                visited.add(child)
+                stack.append([child, 0])
+        indices: Dict[int, int] = {node: len(post_order) - 1 - i for i, node in enumerate(post_order)}
+        nodes: List[int] = post_order[::-1]
+        return OrderDag([[(crease, indices[child]) for crease, child in self._children[node]] for node in nodes],
+                        [self._state_ids[node] for node in nodes])
@@ -1,12 +1,20 @@
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Set, Callable, Union
 from grid import TriangleGrid, Shape
-from itertools import permutations
 from visualization import visualize_grid
-from folding_operations import FoldabilityError, Direction, transform_coordinate, \
-    next_triangle_coordinate, fold_coordinate, coordinate_folds_up
-import random
-from functools import reduce
-from copy import deepcopy
+import numpy as np
+from order_dag import OrderDag, build_order_dag
+from folding_operations import FoldabilityError, Direction, transform_coordinates, next_triangle_coordinate, \
+    fold_coordinate, coordinate_folds_up, fold_coordinates, coordinates_fold_up
+import time
+from array import array
+from collections import OrderedDict
+import weakref
+from abc import ABC, abstractmethod
+import re
+
+
+# Amount of coordinates from which a fold is computed with the vectorized coordinate operations
+VECTORIZE_THRESHOLD: int = 12
 
 
 class StripError(Exception):
@@ -15,17 +23,41 @@ class StripError(Exception):
 
 
 def reduce_int_list(ls: List[int]) -> str:
-    order_string: str = reduce(lambda a, b: a + f'{b}|', ls, '')
-    return order_string[:-1]
+    return '|'.join(map(str, ls))
+
+
+def _coordinate_progress(coordinate: Tuple[int, int, int], direction: Direction) -> int:
+    """
+    Get a value which strictly increases with every step of next_triangle_coordinate in the given direction.
+
+    :param coordinate: the given coordinate
+    :param direction: the direction of the face containing the coordinate
+    :return: position of the coordinate along the direction
+    """
+    if direction == Direction.H:
+        return coordinate[1] + coordinate[2]
+    elif direction == Direction.N:
+        return coordinate[0] + coordinate[2]
+    else:  # direction == Direction.S
+        return coordinate[1] - coordinate[0]
 
 
 class Face:
+    """
+    A straight run of triangles.
+    The face is stored as the coordinates of its first and last triangle, its direction and its length.
+    The coordinates of the triangles in between are only computed when they are requested.
+    """
+    __slots__ = ('_length', '_direction', '_start', '_end', '_coordinates')
+
     def __init__(self, length: int, direction: Direction = Direction.H):
         if length < 1:
             raise StripError(f'Invalid face length: {length}')
         self._length: int = length
         self._direction: Direction = direction
-        self._coordinates: List[Tuple[int, int, int]] = []
+        self._start: Optional[Tuple[int, int, int]] = None
+        self._end: Optional[Tuple[int, int, int]] = None
+        self._coordinates: Optional[List[Tuple[int, int, int]]] = []
 
     def get_direction(self) -> Direction:
         return self._direction
@@ -39,7 +71,9 @@ class Face:
 
         :return: Direction and index of the global crease of this face
         """
-        last_tuple: Tuple[int, int, int] = self._coordinates[-1]
+        if self._end is None:
+            raise StripError('Face has no coordinates')
+        last_tuple: Tuple[int, int, int] = self._end
         if self._direction == Direction.H:
             # H + N = S
             if last_tuple[2] - last_tuple[0] > last_tuple[1]:
@@ -68,6 +102,8 @@ class Face:
             raise Exception
 
     def set_absolute_coordinates(self, coordinates: List[Tuple[int, int, int]]):
+        self._start = coordinates[0]
+        self._end = coordinates[-1]
         self._coordinates = coordinates
 
     def set_coordinates(self, start: Tuple[int, int, int], direction: Direction) -> Tuple[int, int, int]:
@@ -79,32 +115,53 @@ class Face:
 
         :param start: Coordinate of the first triangle of the face
         :param direction: Direction of the face
-        :return:
+        :return: Coordinate of the last triangle of the face
         """
-        current_coordinate: Tuple[int, int, int] = start
         self._direction = direction
-        self._coordinates = [current_coordinate]
+        self._start = start
+        self._coordinates = self.__walk(start)
+        self._end = self._coordinates[-1]
+        return self._end
+
+    def __walk(self, start: Tuple[int, int, int]) -> List[Tuple[int, int, int]]:
+        current_coordinate: Tuple[int, int, int] = start
+        coordinates: List[Tuple[int, int, int]] = [current_coordinate]
         for i in range(self._length - 1):
-            current_coordinate = next_triangle_coordinate(current_coordinate, direction)
-            self._coordinates.append(current_coordinate)
-        return current_coordinate
+            current_coordinate = next_triangle_coordinate(current_coordinate, self._direction)
+            coordinates.append(current_coordinate)
+        return coordinates
 
     def get_coordinates(self) -> List[Tuple[int, int, int]]:
+        """
+        Get the coordinates of all triangles of the face, from the first to the last triangle.
+        The coordinates are computed from the first or last triangle, depending on which one
+        next_triangle_coordinate walks away from, and kept until the face is folded again.
+
+        :return: List of triangle coordinates
+        """
+        if self._coordinates is None:
+            if _coordinate_progress(self._end, self._direction) >= _coordinate_progress(self._start, self._direction):
+                self._coordinates = self.__walk(self._start)
+            else:
+                self._coordinates = self.__walk(self._end)
+                self._coordinates.reverse()
         return self._coordinates
 
+    def get_state(self) -> Tuple:
+        return self._direction, self._start, self._end, self._coordinates
+
+    def set_state(self, state: Tuple):
+        self._direction, self._start, self._end, self._coordinates = state
+
     def fold(self, direction: Direction, index: int):
         """
         Fold a face according to a given fold line.
-        All coordinates of the face are updated according to the given fold line.
+        Only the first and last triangle are folded, the other coordinates follow from the new direction.
 
         :param direction: The direction of the fold line
         :param index: The index of the fold line
         :return:
         """
-        new_coordinates: List[Tuple[int, int, int]] = []
-        for coordinate in self._coordinates:
-            new_coordinate: Tuple[int, int, int] = fold_coordinate(coordinate, direction, index)
-            new_coordinates.append(new_coordinate)
         if direction == Direction.H:
             if self._direction == Direction.N:
                 self._direction = Direction.S
@@ -122,7 +179,10 @@ class Face:
                 self._direction = Direction.N
         else:
             raise ValueError
-        self._coordinates = new_coordinates
+        if self._start is not None:
+            self._start = fold_coordinate(self._start, direction, index)
+            self._end = fold_coordinate(self._end, direction, index)
+            self._coordinates = None
 
     def calculate_triangles(self) -> List[Tuple[int, int]]:
         """
@@ -130,10 +190,298 @@ class Face:
 
         :return: List of Triangles with traditional coordinates
         """
-        triangles: List[Tuple[int, int]] = []
-        for coordinate in self._coordinates:
-            triangles.append(transform_coordinate(coordinate))
-        return triangles
+        return list(map(tuple, transform_coordinates(np.array(self.get_coordinates())).tolist()))
+
+
+class SearchBudgetError(StripError):
+    """Raised when a search runs out of its node or time budget"""
+    pass
+
+
+class SearchBudget:
+    """
+    Limit on the amount of folded states and time a search may use.
+    """
+    __slots__ = ('_nodes_left', '_deadline')
+
+    def __init__(self, node_budget: Optional[int] = None, time_budget: Optional[float] = None):
+        self._nodes_left: Optional[int] = node_budget
+        self._deadline: Optional[float] = None if time_budget is None else time.monotonic() + time_budget
+
+    def spend(self):
+        """
+        Charge the budget for one visited state.
+
+        :return:
+        :raises SearchBudgetError: if the budget is exhausted
+        """
+        if self._nodes_left is not None:
+            if self._nodes_left <= 0:
+                raise SearchBudgetError('Node budget exhausted')
+            self._nodes_left -= 1
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise SearchBudgetError('Time budget exhausted')
+
+
+class FoldRecord:
+    """
+    Everything a single fold changed, such that it can be undone exactly.
+    Only the layer stacks and faces touched by the fold are stored.
+    """
+    def __init__(self, index: int, creases: int, folds: int, face_states: List[Tuple]):
+        self.index: int = index
+        self.creases: int = creases
+        self.folds: int = folds
+        self.face_states: List[Tuple] = face_states
+        self.layers: Dict[Tuple[int, int, int], Optional[array]] = {}
+
+
+class CompletionNode:
+    """
+    The valid ways to complete the folding of a strip from some folded state.
+    A completely folded state holds its serialized layers, any other state holds the foldable creases
+    together with the completions after folding them. Nodes of equal states are shared.
+    """
+    __slots__ = ('layers', 'children', '__weakref__')
+
+    def __init__(self, layers: Optional[Dict[str, str]] = None):
+        self.layers: Optional[Dict[str, str]] = layers
+        self.children: List[Tuple[int, Union[CompletionNode, weakref.ref]]] = []
+
+    def is_foldable(self) -> bool:
+        return self.layers is not None or len(self.children) > 0
+
+
+class CompletionVisitor(ABC):
+    """
+    Decides what the depth first search of Strip computes for every folded state it visits: the values of the
+    completely folded states are combined into a value of each partially folded state, which is kept in the
+    transposition table of the search.
+    """
+    def visit(self):
+        """
+        Called for every visited state, before its value is computed.
+
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, strip: 'Strip'):
+        """
+        Get the value of a completely folded state.
+
+        :param strip: the completely folded strip
+        :return: value of the state
+        """
+        pass
+
+    @abstractmethod
+    def start(self):
+        """
+        Get the value of a partially folded state before any of its completions is added.
+
+        :return: initial value
+        """
+        pass
+
+    @abstractmethod
+    def add(self, value, crease: int, child):
+        """
+        Add the value of the state after folding a crease to the value of a partially folded state.
+
+        :param value: value of the partially folded state so far
+        :param crease: folded crease
+        :param child: value of the state after folding the crease
+        :return: new value of the partially folded state
+        """
+        pass
+
+    def is_done(self, value) -> bool:
+        """
+        Check whether the search can stop, the strip is then left folded in the current state.
+
+        :param value: value of the current partially folded state so far
+        :return:
+        """
+        return False
+
+    def reuse(self, strip: 'Strip', value, search: Callable[[], object]):
+        """
+        Called when the value of the current state is found in the transposition table.
+
+        :param strip: the strip in the current state
+        :param value: value stored for the state
+        :param search: function which searches the current state of the strip again
+        :return: value of the state
+        """
+        return value
+
+
+class CompletionCollector(CompletionVisitor):
+    """
+    Computes the CompletionNode of every state, from which all valid orders can be expanded.
+    """
+    def complete(self, strip: 'Strip') -> CompletionNode:
+        return CompletionNode(strip.serialize_layers())
+
+    def start(self) -> CompletionNode:
+        return CompletionNode()
+
+    def add(self, value: CompletionNode, crease: int, child: CompletionNode) -> CompletionNode:
+        if child.is_foldable():
+            value.children.append((crease, child))
+        return value
+
+
+class CompletionEmitter(CompletionVisitor):
+    """
+    Emits every valid order as soon as the search reaches it.
+    The CompletionNode of a partially folded state only refers weakly to the nodes of its partially folded
+    children, such that a node is only kept while its state is in the transposition table. A state found in the
+    table is expanded from its node, the children which were evicted in the meantime are searched again.
+    """
+    def __init__(self, emit: Callable[[List[int], Dict[str, str]], None]):
+        """
+        :param emit: function called with every valid order and the serialized layers of its folded state,
+                     the order list is reused
+        """
+        self._emit: Callable[[List[int], Dict[str, str]], None] = emit
+
+    def complete(self, strip: 'Strip') -> CompletionNode:
+        node: CompletionNode = CompletionNode(strip.serialize_layers())
+        self._emit(strip.get_folded_order(), node.layers)
+        return node
+
+    def start(self) -> CompletionNode:
+        return CompletionNode()
+
+    def add(self, value: CompletionNode, crease: int, child: CompletionNode) -> CompletionNode:
+        if child.is_foldable():
+            value.children.append((crease, child if child.layers is not None else weakref.ref(child)))
+        return value
+
+    def reuse(self, strip: 'Strip', value: CompletionNode, search: Callable[[], object]) -> CompletionNode:
+        self.__expand(strip, strip.get_folded_order(), [], value, search)
+        return value
+
+    def __expand(self, strip: 'Strip', order: List[int], path: List[int], node: CompletionNode,
+                 search: Callable[[], object]):
+        """
+        Emit all orders which complete the given order from the completions kept for its state.
+
+        :param strip: the strip, folded in the order without the path
+        :param order: the creases which are already folded, in folding order
+        :param path: the creases at the end of the order which are not folded on the strip
+        :param node: completions of the order
+        :param search: function which searches the current state of the strip
+        :return:
+        """
+        for crease, child in node.children:
+            order.append(crease)
+            path.append(crease)
+            if isinstance(child, CompletionNode):
+                self._emit(order, child.layers)
+            elif child() is not None:
+                self.__expand(strip, order, path, child(), search)
+            else:
+                for path_crease in path:
+                    strip.simple_fold_crease(path_crease)
+                search()
+                for path_crease in reversed(path):
+                    strip.unfold_crease(path_crease)
+            path.pop()
+            order.pop()
+
+
+class CompletionCounter(CompletionVisitor):
+    """
+    Counts the valid completions of every state, without serializing any layers.
+    """
+    def complete(self, strip: 'Strip') -> int:
+        return 1
+
+    def start(self) -> int:
+        return 0
+
+    def add(self, value: int, crease: int, child: int) -> int:
+        return value + child
+
+
+class CompletionFinder(CompletionVisitor):
+    """
+    Finds whether a state has a valid completion, the search stops at the first one.
+    The transposition table thus only holds states without completion.
+    """
+    def __init__(self, budget: 'SearchBudget'):
+        """
+        :param budget: budget which is charged for every visited state
+        """
+        self._budget: SearchBudget = budget
+
+    def visit(self):
+        self._budget.spend()
+
+    def complete(self, strip: 'Strip') -> bool:
+        return True
+
+    def start(self) -> bool:
+        return False
+
+    def add(self, value: bool, crease: int, child: bool) -> bool:
+        return value or child
+
+    def is_done(self, value: bool) -> bool:
+        return value
+
+
+class OrderSink(ABC):
+    """
+    Receives the orders found by Strip.all_simple_folds together with the serialized layers of their folded state,
+    instead of collecting them in the database dictionary of the strip.
+    """
+    @abstractmethod
+    def add(self, order: List[int], layers: Dict[str, str]):
+        """
+        Receive a valid order. The order list is reused by the caller and has to be copied to keep it.
+
+        :param order: order in which the creases are folded
+        :param layers: serialized layers of the folded state, shared between orders and not to be modified
+        :return:
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class ChunkedOrderSink(OrderSink):
+    """
+    Passes the received orders on in chunks of bounded size, such that they do not all have to be kept in memory.
+    """
+    def __init__(self, write: Callable[[List[Tuple[List[int], Dict[str, str]]]], None], chunk_size: int = 10000):
+        """
+        :param write: function called with every chunk of (order, layers)
+        :param chunk_size: maximum amount of orders kept before they are written
+        """
+        if chunk_size < 1:
+            raise ValueError('Invalid chunk size')
+        self._write: Callable[[List[Tuple[List[int], Dict[str, str]]]], None] = write
+        self._chunk_size: int = chunk_size
+        self._chunk: List[Tuple[List[int], Dict[str, str]]] = []
+
+    def add(self, order: List[int], layers: Dict[str, str]):
+        self._chunk.append((list(order), layers))
+        if len(self._chunk) >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._chunk) > 0:
+            self._write(self._chunk)
+            self._chunk = []
+
+    def close(self):
+        self.flush()
 
 
 class Strip:
@@ -144,12 +492,13 @@ class Strip:
         self._creases_base: int = creases
         self._folds: int = folds
         self._folds_base: int = folds
-        self._layers: Dict[Tuple[int, int, int], List[Face]] = {}
+        self._layers: Dict[Tuple[int, int, int], array] = {}
+        self._journal: List[FoldRecord] = []
         self._db = {}
         self.initialize_faces()
 
     def get_layers(self) -> Dict[Tuple[int, int, int], List[Face]]:
-        return deepcopy(self._layers)
+        return {coordinate: [self._faces[face] for face in layers] for coordinate, layers in self._layers.items()}
 
     def get_length(self) -> int:
         length = 0
@@ -193,90 +542,290 @@ class Strip:
         :return:
         """
         current_coordinate: Tuple[int, int, int] = (0, 0, 1)
-        for face in self._faces:
+        for face_index, face in enumerate(self._faces):
             current_coordinate = face.set_coordinates(current_coordinate, Direction.H)
             current_coordinate = next_triangle_coordinate(current_coordinate, Direction.H)
             for triangle in face.get_coordinates():
                 if triangle not in self._layers:
-                    self._layers[triangle] = []
-                self._layers[triangle].append(face)
+                    self._layers[triangle] = array('h')
+                self._layers[triangle].append(face_index)
 
     def reset_strip(self):
         self._creases = self._creases_base
         self._folds = self._folds_base
         self._layers = {}
+        self._journal = []
         self.initialize_faces()
 
-    def _add_strip_to_database(self, order: List[int]):
+    def get_folded_order(self) -> List[int]:
+        """
+        Get the creases folded since the last reset which can still be unfolded, in folding order.
+
+        :return: list of crease indices
+        """
+        return [record.index for record in self._journal]
+
+    def unfold_crease(self, index: Optional[int] = None) -> int:
+        """
+        Undo the most recent fold.
+        Only the layer stacks and faces which were touched by that fold are restored.
+
+        :param index: the crease which is expected to be unfolded, if given
+        :return: the index of the unfolded crease
+        """
+        if not self._journal:
+            raise StripError('No folded crease to unfold')
+        if index is not None and self._journal[-1].index != index:
+            raise StripError(f'Crease {index} is not the last folded crease')
+        record: FoldRecord = self._journal.pop()
+        self.__undo_fold_record(record)
+        return record.index
+
+    def unfold_all(self):
+        """
+        Undo all folds since the last reset.
+
+        :return:
+        """
+        while self._journal:
+            self.unfold_crease()
+
+    def __undo_fold_record(self, record: FoldRecord):
+        self._creases = record.creases
+        self._folds = record.folds
+        for coordinate, faces in record.layers.items():
+            if faces is None:
+                self._layers.pop(coordinate, None)
+            else:
+                self._layers[coordinate] = faces
+        for face, face_state in zip(self._faces[record.index + 1:], record.face_states):
+            face.set_state(face_state)
+
+    def __record_layers(self, coordinate: Tuple[int, int, int]):
+        """
+        Store the layers of a coordinate in the journal before the current fold changes them.
+        Layer stacks are never changed in place after initialization, so storing a reference suffices.
+
+        :param coordinate: the coordinate which is about to be changed
+        :return:
+        """
+        changed_layers: Dict[Tuple[int, int, int], Optional[array]] = self._journal[-1].layers
+        if coordinate not in changed_layers:
+            changed_layers[coordinate] = self._layers.get(coordinate)
+
+    def _add_strip_to_database(self, order: List[int], layers: Optional[Dict[str, str]] = None):
         """
         Add the strip order to the database.
         Database is structures as (for coordinate (0, 0, 1) with order [1, 2, 3] with face order [1,2,3,4]):
         { '0|0|1': {'1|2|3': '1|2|3|4'} }
 
         :param order: order in which the creases are folded
+        :param layers: serialized layers of the folded state, the current layers are used if not given
         :return:
         """
-        self.sanitize_layers()
+        if layers is None:
+            layers = self.serialize_layers()
         order_string: str = reduce_int_list(order)
-        for coord, faces in self._layers.items():
-            coordinate: str = f'{coord[0]}|{coord[1]}|{coord[2]}'
+        for coordinate, faces in layers.items():
             if coordinate not in self._db:
                 self._db[coordinate] = {
-                    order_string: reduce_int_list([self._faces.index(face) for face in faces])
+                    order_string: faces
                 }
             else:
-                self._db[coordinate][order_string] = reduce_int_list([self._faces.index(face) for face in faces])
+                self._db[coordinate][order_string] = faces
+
+    def serialize_layers(self) -> Dict[str, str]:
+        """
+        Serialize the current layers as they are stored in the database.
+
+        :return: dictionary from coordinate string to layer string
+        """
+        return {f'{coordinate[0]}|{coordinate[1]}|{coordinate[2]}': reduce_int_list(faces)
+                for coordinate, faces in self._layers.items() if len(faces) > 0}
+
+    def __get_state_key(self) -> Tuple:
+        """
+        Get a hashable key which is equal for two strips exactly when they are in the same folded state.
 
-    def all_simple_folds(self) -> bool:
+        :return: key of the folded creases, the crease assignments, the faces and the layer stacks
         """
-        Go over all possible orders in which to fold this strip and add it to the database
+        faces: Tuple = tuple(face.get_state()[:3] for face in self._faces)
+        layers: frozenset = frozenset((coordinate, stack.tobytes()) for coordinate, stack in self._layers.items()
+                                      if len(stack) > 0)
+        return self._folds, self._creases, faces, layers
 
+    def all_simple_folds(self, cache_size: int = 100000, sink: Optional[OrderSink] = None) -> bool:
+        """
+        Go over all possible orders in which to fold this strip and add it to the database.
+        The orders are explored depth first: a crease is folded on top of the current prefix and undone on
+        backtracking. A prefix which is not simple foldable prunes all orders starting with it.
+        Different prefixes often lead to the same folded state, the creases after which a state can be completed
+        are therefore kept in a transposition table, such that they are only searched once.
+        The orders are emitted while they are found, the search itself only keeps the transposition table,
+        so its memory is bounded by cache_size.
+        With a sink, the orders are passed to the sink one by one while they are found instead of being added to
+        the database dictionary, which would otherwise hold every order of the strip at once. The sink is not closed.
+
+        :param cache_size: maximum amount of folded states in the transposition table
+        :param sink: receiver of the valid orders, the database dictionary of the strip if not given
+        :return: boolean whether at least one valid order was found
+        """
+        self.reset_strip()
+        emitter: CompletionEmitter = CompletionEmitter(self._add_strip_to_database if sink is None else sink.add)
+        return self.__search_completions(emitter, OrderedDict(), cache_size).is_foldable()
+
+    def get_order_dag(self, cache_size: int = 100000) -> Tuple[OrderDag, List[Dict[str, str]]]:
+        """
+        Find all orders in which this strip can be simple folded as all_simple_folds does,
+        but keep them as a graph sharing common prefixes and suffixes instead of adding them to the database.
+
+        :param cache_size: maximum amount of folded states in the transposition table
+        :return: graph of the valid orders and the distinct folded states its state ids refer to
+        """
+        self.reset_strip()
+        return build_order_dag(self.__search_completions(CompletionCollector(), OrderedDict(), cache_size))
+
+    def __search_completions(self, visitor: CompletionVisitor, transpositions: OrderedDict, cache_size: int):
+        """
+        Search all valid completions of the current (partially folded) strip depth first and combine them with
+        the visitor. A crease is folded on top of the current state and undone on backtracking.
+
+        :param visitor: computes the value of every visited state
+        :param transpositions: least recently used table from folded state key to its value
+        :param cache_size: maximum amount of entries in transpositions
+        :return: value of the current state
+        """
+        visitor.visit()
+        if self._folds == (1 << self._crease_amount) - 1:
+            return visitor.complete(self)
+        key: Tuple = self.__get_state_key()
+        if key in transpositions:
+            transpositions.move_to_end(key)
+            return visitor.reuse(self, transpositions[key],
+                                 lambda: self.__search_completions(visitor, transpositions, cache_size))
+        value = visitor.start()
+        for crease in range(self._crease_amount):
+            if self._folds & (1 << crease):
+                continue
+            try:
+                self.simple_fold_crease(crease)
+            except FoldabilityError:
+                continue
+            value = visitor.add(value, crease, self.__search_completions(visitor, transpositions, cache_size))
+            if visitor.is_done(value):
+                return value
+            self.unfold_crease(crease)
+        self.__store_transposition(transpositions, key, value, cache_size)
+        return value
+
+    def count_simple_folds(self, cache_size: int = 100000) -> int:
+        """
+        Count the orders in which this strip can be simple folded, without adding them to the database.
+
+        :param cache_size: maximum amount of folded states in the transposition table
+        :return: amount of valid orders
+        """
+        self.reset_strip()
+        return self.__search_completions(CompletionCounter(), OrderedDict(), cache_size)
+
+    def has_simple_fold(self, cache_size: int = 100000) -> bool:
+        """
+        Check whether some order exists in which this strip can be simple folded.
+        The search stops at the first valid order and nothing is added to the database.
+
+        :param cache_size: maximum amount of unfoldable states to remember
+        :return: boolean whether a valid order exists
+        """
+        return self.find_simple_fold_order(cache_size=cache_size) is not None
+
+    def find_simple_fold_order(self,
+                               node_budget: Optional[int] = None,
+                               time_budget: Optional[float] = None,
+                               cache_size: int = 100000) -> Optional[List[int]]:
+        """
+        Find an order in which this strip can be simple folded.
+        The orders are searched depth first in a fixed order, such that the answer is deterministic and an
+        order is always found if one exists. The strip is unfolded again afterwards.
+
+        :param node_budget: maximum amount of folded states to visit, unlimited if not given
+        :param time_budget: maximum amount of seconds to search, unlimited if not given
+        :param cache_size: maximum amount of unfoldable states to remember
+        :return: a valid order, or None if no valid order exists
+        :raises SearchBudgetError: if the budget is exhausted before the search is done
+        """
+        self.reset_strip()
+        finder: CompletionFinder = CompletionFinder(SearchBudget(node_budget, time_budget))
+        try:
+            if self.__search_completions(finder, OrderedDict(), cache_size):
+                return self.get_folded_order()
+            return None
+        finally:
+            self.unfold_all()
+
+    @staticmethod
+    def __store_transposition(transpositions: OrderedDict, key: Tuple, value, cache_size: int):
+        transpositions[key] = value
+        if len(transpositions) > cache_size:
+            transpositions.popitem(last=False)
+
+    def add_orders_to_database(self, orders: List[List[int]]):
+        """
+        Fold the strip in each of the given valid orders and add them to the database.
+        The orders are folded in sorted order, such that a prefix shared with the previous order is not refolded.
+
+        :param orders: valid orders in which to fold the creases
         :return:
         """
-        orders: List[int] = list(range(0, self._crease_amount))
-        random.shuffle(orders)
-        found_valid_foldable_order: bool = False
-        for order in permutations(orders):
-            self.reset_strip()
-            if self.is_simple_foldable_order(list(order), visualization=False):
-                self._add_strip_to_database(list(order))
-                found_valid_foldable_order = True
-                pass
-        return found_valid_foldable_order
+        self.reset_strip()
+        for order in sorted(orders):
+            folded_order: List[int] = self.get_folded_order()
+            shared: int = 0
+            while shared < len(folded_order) and folded_order[shared] == order[shared]:
+                shared += 1
+            for _ in range(len(folded_order) - shared):
+                self.unfold_crease()
+            for crease in order[shared:]:
+                self.simple_fold_crease(crease)
+            self._add_strip_to_database(order)
 
     def sanitize_layers(self):
         self._layers = {k: v for k, v in self._layers.items() if len(v) > 0}
 
-    def is_simple_foldable(self, visualization: bool = False, animate: bool = False) -> bool:
+    def is_simple_foldable(self,
+                           visualization: bool = False,
+                           animate: bool = False,
+                           node_budget: Optional[int] = None,
+                           time_budget: Optional[float] = None) -> Optional[bool]:
         """
         Check whether the strip is simple foldable.
-        Randomly get some order and check whether it is simple foldable.
-        This does not guarantee a correct answer.
-        Remove randomization to go brute force for a real answer.
+        Search for a valid order with find_simple_fold_order and leave the strip folded in that order.
+        The valid order is added to the database.
 
         :param visualization: Whether we want to visualize the strip
         :param animate: Whether we want to animate the folding sequence
-        :return: boolean whether the strip is simple foldable
-        """
-        # orders = list(permutations(range(0, self._crease_amount)))
-        orders: List[int] = list(range(0, self._crease_amount))
-        for _ in permutations(orders):
-            random.shuffle(orders)  # Remove this to find a definitive answer
-            self.reset_strip()
-            if self.is_simple_foldable_order(list(orders), visualization=False):
-                if visualization:
-                    print(self.get_strip_string())
-                    print('Found valid order: {}'.format(list(orders)))
-                    # self.visualize_strip(name=self.get_strip_string())
-                if animate:
-                    self.reset_strip()
-                    self.is_simple_foldable_order(list(orders), animate=True)
-                self.sanitize_layers()
-                self._add_strip_to_database(orders)
-                return True
-        print('No valid order: {}'.format(self.get_strip_string()))
+        :param node_budget: maximum amount of folded states to visit, unlimited if not given
+        :param time_budget: maximum amount of seconds to search, unlimited if not given
+        :return: boolean whether the strip is simple foldable, or None if the budget ran out (unknown)
+        """
+        try:
+            order: Optional[List[int]] = self.find_simple_fold_order(node_budget, time_budget)
+        except SearchBudgetError:
+            print('Unknown whether simple foldable: {}'.format(self.get_strip_string()))
+            return None
+        if order is None:
+            print('No valid order: {}'.format(self.get_strip_string()))
+            self.sanitize_layers()
+            return False
+        if visualization:
+            print(self.get_strip_string())
+            print('Found valid order: {}'.format(order))
+        if animate:
+            self.is_simple_foldable_order(order, animate=True)
+        else:
+            self.is_simple_foldable_order(order, visualization=False)
         self.sanitize_layers()
-        return False
+        self._add_strip_to_database(order)
+        return True
 
     def is_simple_foldable_order(self, crease_order: List[int], one_way_fold: bool = False,
                                  visualization: bool = True, animate: bool = False) -> bool:
@@ -333,13 +882,13 @@ class Strip:
         :param face_index:
         :return:
         """
-        layers: List[Face] = self._layers[coordinate]
-        iterable = reversed(range(len(layers))) if up else range(len(layers))
+        layers: array = self._layers[coordinate]
+        iterable = reversed(layers) if up else layers
         obstructed: bool = False
         for layer_face in iterable:
-            if self._faces.index(layers[layer_face]) < face_index:
+            if layer_face < face_index:
                 obstructed = True
-            if obstructed and self._faces.index(layers[layer_face]) >= face_index:
+            elif obstructed:
                 return False
         return True
 
@@ -366,28 +915,35 @@ class Strip:
         :param up: whether the coordinate folds up or down
         :return: a list of faces which are folded
         """
-        layers: List[Face] = self._layers[coordinate]
+        return [self._faces[face] for face in self.__get_folding_layer_ids(coordinate, crease_index, up)]
+
+    def __get_folding_layer_ids(self, coordinate: Tuple[int, int, int], crease_index: int, up: bool) -> array:
+        """
+        Get the face indices of the layers which are to be folded for the given coordinate.
+        These are the faces after crease_index on the top (up) or the bottom (down) of the layer stack.
+
+        :param coordinate: the coordinate to be folded
+        :param crease_index: the index of the crease (to find subsequent faces)
+        :param up: whether the coordinate folds up or down
+        :return: the face indices which are folded, from bottom to top
+        """
+        layers: array = self._layers[coordinate]
         if len(layers) == 0:
             raise Exception('No layers: {}'.format(layers))
-        folding_layers: List[Face] = []
         if up:
-            if self._faces.index(layers[-1]) <= crease_index:
+            if layers[-1] <= crease_index:
                 raise Exception('Not foldable')
-            for layer in reversed(range(len(layers))):
-                if self._faces.index(layers[layer]) <= crease_index:
-                    folding_layers.reverse()
-                    return folding_layers
-                folding_layers.append(layers[layer])
-            folding_layers.reverse()
-            return folding_layers
+            bottom: int = len(layers) - 1
+            while bottom > 0 and layers[bottom - 1] > crease_index:
+                bottom -= 1
+            return layers[bottom:]
         else:
-            if self._faces.index(layers[0]) <= crease_index:
+            if layers[0] <= crease_index:
                 raise Exception('Not foldable')
-            for layer in range(len(layers)):
-                if self._faces.index(layers[layer]) <= crease_index:
-                    return folding_layers
-                folding_layers.append(layers[layer])
-            return folding_layers
+            top: int = 1
+            while top < len(layers) and layers[top] > crease_index:
+                top += 1
+            return layers[:top]
 
     def __fold_layer_ordering(self,
                               coordinate,
@@ -397,6 +953,7 @@ class Strip:
                               folded_coordinate_exists: bool):
         """
         Fold the layers to the new coordinate.
+        Layer stacks are replaced instead of changed in place, such that the journal can keep the old stacks.
 
         :param coordinate: the coordinate to be folded
         :param folded_coordinate: the coordinate of the folded location
@@ -405,41 +962,38 @@ class Strip:
         :param folded_coordinate_exists: boolean indicating the existence of the folded coordinate
         :return:
         """
+        self.__record_layers(coordinate)
+        self.__record_layers(folded_coordinate)
+        layers: array = self._layers[coordinate]
+        layers_1: array = self.__get_folding_layer_ids(coordinate, crease_index, up)
+        # Remove current layers from current coordinate
+        layers = layers[:len(layers) - len(layers_1)] if up else layers[len(layers_1):]
         if folded_coordinate_exists:
-            layers_1: List[Face] = self.get_folding_layers(coordinate, crease_index, up)
-            layers_2: List[Face] = self.get_folding_layers(folded_coordinate, crease_index, not up)
-            # Remove current layers form current and folded coordinate
-            for face in layers_1:
-                self._layers[coordinate].remove(face)
-            for face in layers_2:
-                self._layers[folded_coordinate].remove(face)
-            # Add current and folded coordinate to visited list
-            layers_1.reverse()
-            layers_2.reverse()
+            folded_layers: array = self._layers[folded_coordinate]
+            layers_2: array = self.__get_folding_layer_ids(folded_coordinate, crease_index, not up)
+            # Remove folded layers from folded coordinate and put them upside down on the current coordinate
             if up:
-                self._layers[folded_coordinate].extend(layers_1)
-                self._layers[coordinate] = layers_2 + self._layers[coordinate]
+                folded_layers = folded_layers[len(layers_2):]
+                layers = layers_2[::-1] + layers
             else:
-                self._layers[folded_coordinate] = layers_1 + self._layers[folded_coordinate]
-                self._layers[coordinate].extend(layers_2)
+                folded_layers = folded_layers[:len(folded_layers) - len(layers_2)]
+                layers = layers + layers_2[::-1]
         else:
-            layers_1: List[Face] = self.get_folding_layers(coordinate, crease_index, up)
-            # Remove current layers form current and folded coordinate
-            for face in layers_1:
-                self._layers[coordinate].remove(face)
-            # Add current and folded coordinate to visited list
-            layers_1.reverse()
-            if folded_coordinate not in self._layers:
-                self._layers[folded_coordinate] = []
-            if up:
-                self._layers[folded_coordinate].extend(layers_1)
-            else:
-                self._layers[folded_coordinate] = layers_1 + self._layers[folded_coordinate]
+            folded_layers: array = self._layers.get(folded_coordinate, array('h'))
+        # Put current layers upside down on the folded coordinate
+        if up:
+            folded_layers = folded_layers + layers_1[::-1]
+        else:
+            folded_layers = layers_1[::-1] + folded_layers
+        self._layers[coordinate] = layers
+        self._layers[folded_coordinate] = folded_layers
 
     def simple_fold_crease(self, index: int):
         """
         Fold the crease at index.
         We fold the crease and transform all subsequent faces which are affected by the fold.
+        The changes are recorded in the journal such that the fold can be undone with unfold_crease.
+        If the crease is not simple foldable, the strip is left unchanged.
 
         :param index: The index of the crease
         :return:
@@ -448,26 +1002,46 @@ class Strip:
             raise ValueError('Invalid crease index: {} out of {}'.format(index, self._crease_amount))
         if self._folds & (1 << index):
             raise Exception('Crease is already folded')
+        self._journal.append(FoldRecord(index, self._creases, self._folds,
+                                        [face.get_state() for face in self._faces[index + 1:]]))
+        try:
+            self.__simple_fold_crease(index)
+        except Exception:
+            self.__undo_fold_record(self._journal.pop())
+            raise
+
+    def __simple_fold_crease(self, index: int):
         m_or_v: int = self._creases & (1 << index)
         all_coordinates: List[Tuple[int, int, int]] = self.__get_all_subsequent_face_coordinates(index + 1)
-        visited_coordinates: List[Tuple[int, int, int]] = []
+        all_coordinates_set: Set[Tuple[int, int, int]] = set(all_coordinates)
+        visited_coordinates: Set[Tuple[int, int, int]] = set()
         crease: Tuple[Direction, int] = self.get_global_crease(index)
-        for coordinate in all_coordinates:
+        face_direction: Direction = self._faces[index + 1].get_direction()
+        # Find the folded coordinates and whether they fold up, vectorized if there are enough coordinates
+        if len(all_coordinates) >= VECTORIZE_THRESHOLD:
+            coordinate_array: np.ndarray = np.array(all_coordinates)
+            folded_coordinates: List[Tuple[int, int, int]] = \
+                list(map(tuple, fold_coordinates(coordinate_array, *crease).tolist()))
+            folds_up: List[bool] = \
+                coordinates_fold_up(coordinate_array, crease, bool(m_or_v), face_direction).tolist()
+        else:
+            folded_coordinates: List[Tuple[int, int, int]] = \
+                [fold_coordinate(coordinate, *crease) for coordinate in all_coordinates]
+            folds_up: List[bool] = [coordinate_folds_up(coordinate, crease, bool(m_or_v), face_direction)
+                                    for coordinate in all_coordinates]
+        for coordinate, folded_coordinate, up in zip(all_coordinates, folded_coordinates, folds_up):
             # Check if we have not already visited this coordinate
             if coordinate not in visited_coordinates:
-                # Find the folded coordinate
-                folded_coordinate: Tuple[int, int, int] = fold_coordinate(coordinate, *crease)
-                up: bool = coordinate_folds_up(coordinate, crease, bool(m_or_v), self._faces[index + 1].get_direction())
 
                 if not self.__is_foldable_coordinate(coordinate, up, index + 1):
                     raise FoldabilityError('Crease not simple foldable: crease {}'.format(index))
-                folded_coordinate_exists: bool = folded_coordinate in all_coordinates
+                folded_coordinate_exists: bool = folded_coordinate in all_coordinates_set
                 if folded_coordinate_exists and not self.__is_foldable_coordinate(folded_coordinate, not up, index + 1):
                     raise FoldabilityError('Crease not simple foldable: crease {}'.format(index))
                 #
                 # Add the coordinates to the visited list
-                visited_coordinates.append(coordinate)
-                visited_coordinates.append(folded_coordinate)
+                visited_coordinates.add(coordinate)
+                visited_coordinates.add(folded_coordinate)
                 #
                 # Put layers in the correct order in the folded coordinate
                 #   If the folded coordinate already existed, also do it for the folded coordinate to current coordinate
@@ -569,3 +1143,144 @@ def construct_strip_str(length: int, creases: int, mv_assignment: int) -> str:
         face_length += 1
     strip_str += str(face_length)
     return strip_str
+
+
+def parse_strip_str(strip: str) -> Tuple[int, int, int]:
+    """
+    Get the integer information of a strip string, the inverse of construct_strip_str.
+
+    :param strip: string representing a strip
+    :return: length, creases and mountain and valley assignment in binary format
+    """
+    parts: List[str] = re.split('([MV])', strip)
+    length: int = 0
+    creases: int = 0
+    mv_assignment: int = 0
+    for crease_i, face_length in enumerate(parts[0::2]):
+        length += int(face_length)
+        if crease_i < len(parts) // 2:
+            creases |= 1 << (length - 1)
+            if parts[2 * crease_i + 1] == 'M':
+                mv_assignment |= 1 << crease_i
+    return length, creases, mv_assignment
+
+
+def get_length_offset(length: int) -> int:
+    """
+    Get the strip ID of the first strip of a length.
+    A strip of length L has L - 1 positions which are either no crease, a valley or a mountain fold,
+    there are thus 3^(L-1) strips of length L and (3^(L-1) - 1) / 2 strips which are shorter.
+
+    :param length: length of the strips
+    :return: amount of strips of a smaller length
+    """
+    return (3 ** (length - 1) - 1) // 2
+
+
+def rank_strip(length: int, creases: int, mv_assignment: int) -> int:
+    """
+    Get the dense strip ID of a strip, the strips of each length have consecutive IDs.
+    Position i of the strip is the ternary digit i of the ID within its length, 0 without crease, 1 for a valley
+    and 2 for a mountain fold.
+
+    :param length: length of the strip
+    :param creases: creases in binary format
+    :param mv_assignment: mountain and valley assignment in binary format
+    :return: strip ID
+    """
+    if length < 1 or creases >= 1 << (length - 1):
+        raise StripError('Invalid strip')
+    rank: int = 0
+    power: int = 1
+    crease_i: int = 0
+    for position in range(length - 1):
+        if creases & (1 << position):
+            rank += power * (2 if mv_assignment & (1 << crease_i) else 1)
+            crease_i += 1
+        power *= 3
+    return get_length_offset(length) + rank
+
+
+def unrank_strip(strip_id: int) -> Tuple[int, int, int]:
+    """
+    Get the strip with the given strip ID, the inverse of rank_strip.
+
+    :param strip_id: strip ID
+    :return: length, creases and mountain and valley assignment in binary format
+    """
+    if strip_id < 0:
+        raise StripError('Invalid strip ID')
+    length: int = 1
+    while get_length_offset(length + 1) <= strip_id:
+        length += 1
+    rank: int = strip_id - get_length_offset(length)
+    creases: int = 0
+    mv_assignment: int = 0
+    crease_i: int = 0
+    for position in range(length - 1):
+        rank, digit = divmod(rank, 3)
+        if digit > 0:
+            creases |= 1 << position
+            if digit == 2:
+                mv_assignment |= 1 << crease_i
+            crease_i += 1
+    return length, creases, mv_assignment
+
+
+def get_crease_type(strip: str) -> int:
+    """
+    Get the crease type of a strip string, bit i is set if crease i lies an odd distance from the start of the strip.
+
+    :param strip: string representing a strip
+    :return: crease type in binary format
+    """
+    crease_type: int = 0
+    length: int = 0
+    for crease_i, face_length in enumerate(re.split('[MV]', strip)[:-1]):
+        length += int(face_length)
+        if length % 2 == 1:
+            crease_type |= 1 << crease_i
+    return crease_type
+
+
+def __reverse_bits(bits: int, amount: int) -> int:
+    return int(format(bits, f'0{amount}b')[::-1], 2) if amount > 0 else 0
+
+
+def get_symmetric_strips(length: int, creases: int, mv_assignment: int) -> List[Tuple[int, int, bool, bool]]:
+    """
+    Get the strips which are equivalent to the given strip.
+    Reversing a strip maps its crease i to crease n - 1 - i of the reversed strip, swapping mountain and valley
+    folds keeps the valid orders and turns every layer stack upside down.
+
+    :param length: Length of the strip
+    :param creases: Creases in binary format
+    :param mv_assignment: Mountain and valley assignment in binary format
+    :return: list of (creases, mv_assignment, reversed, complemented) for the four symmetries
+    """
+    n_creases: int = bin(creases).count('1')
+    reversed_creases: int = __reverse_bits(creases, length - 1)
+    reversed_assignment: int = __reverse_bits(mv_assignment, n_creases)
+    complement: int = (1 << n_creases) - 1
+    return [(creases, mv_assignment, False, False),
+            (creases, mv_assignment ^ complement, False, True),
+            (reversed_creases, reversed_assignment, True, False),
+            (reversed_creases, reversed_assignment ^ complement, True, True)]
+
+
+def get_canonical_strip(length: int, creases: int, mv_assignment: int) -> Tuple[int, int, bool, bool]:
+    """
+    Get the representative of the symmetry class of a strip, which is the one with the smallest creases and
+    mountain and valley assignment. The symmetries are their own inverse, so the returned symmetry also maps
+    the representative to the given strip.
+
+    :param length: Length of the strip
+    :param creases: Creases in binary format
+    :param mv_assignment: Mountain and valley assignment in binary format
+    :return: creases, mv_assignment, reversed, complemented of the representative
+    """
+    return min(get_symmetric_strips(length, creases, mv_assignment))
+
+
+def is_canonical_strip(length: int, creases: int, mv_assignment: int) -> bool:
+    return get_canonical_strip(length, creases, mv_assignment)[:2] == (creases, mv_assignment)
@@ -0,0 +1,171 @@
+from typing import Optional, Dict
+import numpy as np
+import os
+from strip import get_length_offset, rank_strip, parse_strip_str
+from database_tools import open_database
+
+
+INDEX_PATH: str = 'output/strip_index.npy'
+COLUMNS_PATH: str = 'output/columns'
+# Numeric columns of the strips table which are exported, with their type in the exported files
+EXPORTED_COLUMNS: Dict[str, str] = {
+    'len': '<i2',
+    'n_creases': '<i2',
+    'M_creases': '<i2',
+    'creases': '<i8',
+    'crease_direction': '<i8',
+    'crease_type': '<i8',
+    'n_orders': '<i8',
+    'n_states': '<i4',
+    'n_faces': '<i2',
+    'max_layer_depth': '<i4',
+}
+# Fixed size record per strip ID, rowid is -1 for strips which are not in the database
+INDEX_DTYPE: np.dtype = np.dtype([('rowid', '<i8'),
+                                  ('n_orders', '<i8'),
+                                  ('n_states', '<i4'),
+                                  ('max_layer_depth', '<i4')])
+
+
+class StripIndex:
+    """
+    Memory mapped array with a record per strip ID, see rank_strip.
+    Looking up a strip or all strips of a length is offset arithmetic instead of a search on strip names.
+    """
+    def __init__(self, path: str = INDEX_PATH):
+        """
+        :param path: index file written by build_strip_index
+        """
+        self._records: np.ndarray = np.load(path, mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get_max_length(self) -> int:
+        length: int = 1
+        while get_length_offset(length + 2) <= len(self._records):
+            length += 1
+        return length
+
+    def get(self, strip_id: int) -> np.void:
+        """
+        Get the record of a strip ID.
+
+        :param strip_id: strip ID
+        :return: record with the fields of INDEX_DTYPE
+        """
+        return self._records[strip_id]
+
+    def get_strip(self, strip: str) -> np.void:
+        """
+        Get the record of a strip string.
+
+        :param strip: string representing a strip
+        :return: record with the fields of INDEX_DTYPE
+        """
+        return self._records[rank_strip(*parse_strip_str(strip))]
+
+    def get_length(self, length: int) -> np.ndarray:
+        """
+        Get a view on the records of all strips of a length, in order of their strip ID.
+
+        :param length: length of the strips
+        :return: array of records
+        """
+        return self._records[get_length_offset(length):get_length_offset(length + 1)]
+
+    def get_rowid(self, strip: str) -> Optional[int]:
+        """
+        Get the rowid of a strip in the strips table.
+
+        :param strip: string representing a strip
+        :return: rowid, or None if the strip is not in the database
+        """
+        rowid: int = int(self.get_strip(strip)['rowid'])
+        return rowid if rowid >= 0 else None
+
+
+def build_strip_index(max_length: int, path: str = INDEX_PATH) -> StripIndex:
+    """
+    Write the index file of all strips up to a length in the database.
+
+    :param max_length: maximum length of the strips in the index
+    :param path: path of the index file
+    :return: the written index
+    """
+    if max_length < 1:
+        raise ValueError('Invalid maximum length')
+    records: np.memmap = np.lib.format.open_memmap(path, mode='w+', dtype=INDEX_DTYPE,
+                                                   shape=(get_length_offset(max_length + 1),))
+    records['rowid'] = -1
+    connection, cur = open_database()
+    cur.execute('SELECT rowid, strip_name, n_orders, n_states, max_layer_depth FROM strips WHERE len<=?',
+                (max_length,))
+    while True:
+        rows = cur.fetchmany(10000)
+        if len(rows) == 0:
+            break
+        strip_ids = [rank_strip(*parse_strip_str(row[1])) for row in rows]
+        records[strip_ids] = [(row[0], row[2] or 0, row[3] or 0, row[4] or 0) for row in rows]
+    records.flush()
+    del records
+    return StripIndex(path)
+
+
+def export_columns(max_length: Optional[int] = None, directory: str = COLUMNS_PATH) -> Dict[str, np.ndarray]:
+    """
+    Write the numeric columns of the strips table to a .npy file per column, indexed by strip ID.
+    Strip IDs without a strip in the database have the value -1 in every column.
+
+    :param max_length: maximum length of the exported strips, the longest strip in the database if not given
+    :param directory: directory of the column files
+    :return: the exported columns, see load_columns
+    """
+    connection, cur = open_database()
+    if max_length is None:
+        cur.execute('SELECT MAX(len) FROM strips')
+        max_length = cur.fetchone()[0] or 1
+    os.makedirs(directory, exist_ok=True)
+    size: int = get_length_offset(max_length + 1)
+    columns: Dict[str, np.memmap] = {}
+    for column, dtype in EXPORTED_COLUMNS.items():
+        columns[column] = np.lib.format.open_memmap(os.path.join(directory, f'{column}.npy'), mode='w+',
+                                                    dtype=dtype, shape=(size,))
+        columns[column][:] = -1
+    cur.execute(f'SELECT strip_name, {", ".join(EXPORTED_COLUMNS)} FROM strips WHERE len<=?', (max_length,))
+    while True:
+        rows = cur.fetchmany(10000)
+        if len(rows) == 0:
+            break
+        strip_ids = np.array([rank_strip(*parse_strip_str(row[0])) for row in rows], dtype=np.int64)
+        for i, column in enumerate(EXPORTED_COLUMNS, start=1):
+            columns[column][strip_ids] = [-1 if row[i] is None else row[i] for row in rows]
+    for column in columns.values():
+        column.flush()
+    del columns
+    return load_columns(directory)
+
+
+def load_columns(directory: str = COLUMNS_PATH) -> Dict[str, np.ndarray]:
+    """
+    Open the columns written by export_columns read-only and memory mapped.
+    Entry i of every column belongs to the strip with strip ID i, strips which were not exported have length -1.
+
+    :param directory: directory of the column files
+    :return: dictionary from column name to its array
+    """
+    return {column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r') for column in EXPORTED_COLUMNS}
+
+
+def count_bits(values: np.ndarray, bits: int = 64) -> np.ndarray:
+    """
+    Count the set bits of every value of a non-negative integer array.
+
+    :param values: integer array
+    :param bits: amount of lower bits to count
+    :return: array with the amount of set bits per value
+    """
+    counts: np.ndarray = np.zeros(values.shape, dtype=np.int64)
+    for bit in range(bits):
+        counts += (values >> bit) & 1
+    return counts
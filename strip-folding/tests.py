@@ -1,13 +1,31 @@
 import unittest
-from typing import List, Tuple
-from strip import Strip, Face
+from typing import List, Tuple, Optional
+from strip import Strip, Face, get_strip_from_str, SearchBudgetError, parse_strip_str, construct_strip_str, \
+    get_canonical_strip, ChunkedOrderSink, rank_strip, unrank_strip, get_length_offset
 from data_processing import analyze_states, fold_least_crease_strategy, \
     visualize_order_amount, calculate_all_folds_strip_length, \
     test_if_consecutive_exists, find_any_cycle, analyze_same_crease_patterns, \
-    analyze_no_two_direction_fold, analyze_strip, analyze_stamp_folding
-from folding_operations import is_upside_down, Direction, coordinate_folds_up
+    analyze_no_two_direction_fold, analyze_strip, analyze_stamp_folding, derive_symmetric_layers, \
+    construct_order_lattice, has_layer_cycle, OrderAmountAnalyzer, get_order_amount_histogram, get_strip_row, \
+    build_order_index, OrderDagSink, get_strip_layers
+from folding_operations import is_upside_down, Direction, coordinate_folds_up, FoldabilityError, \
+    fold_coordinate, transform_coordinate, fold_coordinates, coordinates_fold_up
 from data_visualization import random_simple_foldable
+from database_tools import split_layers, join_states
+from encoding import rank_order, unrank_order, encode_order, decode_order, encode_state, decode_state
+from order_dag import OrderDag, OrderDagBuilder, decode_order_dag
+from histogram import Histogram2D, load_histogram
+from strip_index import export_columns, load_columns, EXPORTED_COLUMNS, StripIndex, build_strip_index
+from analysis_pipeline import StripRow, STRIP_COLUMNS, StripAnalyzer, run_analyses
+from itertools import permutations
+from unittest import mock
+import database_tools
+import numpy as np
 import random
+import tempfile
+import sqlite3
+import json
+import os
 
 
 class MethodTests(unittest.TestCase):
@@ -20,6 +38,35 @@ class MethodTests(unittest.TestCase):
         self.assertFalse(is_upside_down((0, 0, 1)))
         self.assertFalse(is_upside_down((-1, 1, 1)))
 
+    def test_vectorized_coordinates(self):
+        face: Face = Face(20)
+        face.set_coordinates((0, 0, 1), Direction.H)
+        face.fold(Direction.N, 3)
+        coordinates = face.get_coordinates()
+        coordinate_array = np.array(coordinates)
+        self.assertEqual(face.calculate_triangles(), [transform_coordinate(c) for c in coordinates])
+        for direction, index in [(Direction.H, 1), (Direction.N, -2), (Direction.S, 5)]:
+            self.assertEqual(fold_coordinates(coordinate_array, direction, index).tolist(),
+                             [list(fold_coordinate(c, direction, index)) for c in coordinates])
+            for face_direction in Direction:
+                if face_direction == direction:
+                    continue
+                for is_mountain_fold in [True, False]:
+                    self.assertEqual(
+                        coordinates_fold_up(coordinate_array, (direction, index), is_mountain_fold,
+                                            face_direction).tolist(),
+                        [coordinate_folds_up(c, (direction, index), is_mountain_fold, face_direction)
+                         for c in coordinates])
+
+    def test_face_fold(self):
+        for length in range(1, 8):
+            face: Face = Face(length)
+            face.set_coordinates((0, 0, 1), Direction.H)
+            for direction, index in [(Direction.N, 2), (Direction.S, 0), (Direction.H, 1), (Direction.N, -3)]:
+                expected = [fold_coordinate(coordinate, direction, index) for coordinate in face.get_coordinates()]
+                face.fold(direction, index)
+                self.assertEqual(face.get_coordinates(), expected)
+
 
 class VisualizationTests(unittest.TestCase):
     def test_strip_visualization(self):
@@ -117,6 +164,226 @@ class VisualizationTests(unittest.TestCase):
         strip: Strip = Strip(faces, creases, folds, 3)
         self.assertFalse(strip.is_simple_foldable_order([0, 1, 2]))
 
+    def test_all_simple_folds(self):
+        for strip_str in ['2V1M1M1', '1V1V1V1V1', '3M1V2V1M2', '1M2V1M1V3']:
+            strip: Strip = get_strip_from_str(strip_str)
+            self.assertTrue(strip.all_simple_folds())
+            found_orders = set(next(iter(strip.get_db().values())).keys())
+            valid_orders = set()
+            for order in permutations(range(strip.get_crease_amount())):
+                strip.reset_strip()
+                if strip.is_simple_foldable_order(list(order), visualization=False):
+                    valid_orders.add('|'.join(map(str, order)))
+            self.assertEqual(found_orders, valid_orders)
+            uncached_strip: Strip = get_strip_from_str(strip_str)
+            uncached_strip.all_simple_folds(cache_size=0)
+            self.assertEqual(uncached_strip.get_db(), strip.get_db())
+            self.assertEqual(strip.count_simple_folds(), len(valid_orders))
+            self.assertEqual(strip.count_simple_folds(cache_size=0), len(valid_orders))
+            self.assertTrue(strip.has_simple_fold())
+        strip: Strip = get_strip_from_str('5')
+        self.assertEqual(strip.count_simple_folds(), 1)
+        self.assertTrue(strip.has_simple_fold())
+
+    def test_unfold_crease(self):
+        def strip_state(strip: Strip):
+            def face_state(face: Face):
+                return face.get_length(), face.get_direction(), tuple(face.get_coordinates())
+            layers = {coordinate: [face_state(face) for face in layer]
+                      for coordinate, layer in strip.get_layers().items() if len(layer) > 0}
+            return layers, [face_state(face) for face in strip.get_faces()]
+
+        strip: Strip = get_strip_from_str('2V1M3V1M1V2')
+        initial_state = strip_state(strip)
+        strip.simple_fold_crease(1)
+        folded_state = strip_state(strip)
+        for crease in [3, 0, 2, 4]:
+            try:
+                strip.simple_fold_crease(crease)
+            except FoldabilityError:
+                self.assertEqual(strip.get_folded_order()[-1], 1)
+        self.assertEqual(strip.get_folded_order()[0], 1)
+        while len(strip.get_folded_order()) > 1:
+            strip.unfold_crease()
+        self.assertEqual(strip_state(strip), folded_state)
+        self.assertEqual(strip.unfold_crease(1), 1)
+        self.assertEqual(strip_state(strip), initial_state)
+
+    def test_find_simple_fold_order(self):
+        strip: Strip = get_strip_from_str('1V1M1V1V1M1V1M1V1')
+        order = strip.find_simple_fold_order()
+        self.assertEqual(order, strip.find_simple_fold_order())
+        self.assertTrue(strip.is_simple_foldable_order(order, visualization=False))
+        with self.assertRaises(SearchBudgetError):
+            strip.find_simple_fold_order(node_budget=3)
+        self.assertIsNone(strip.is_simple_foldable(node_budget=3))
+        self.assertTrue(strip.is_simple_foldable(time_budget=60))
+
+    def test_symmetric_strips(self):
+        for strip_str in ['2V1M1M1', '1V3V1M2', '1M1V2', '4']:
+            length, creases, mv_assignment = parse_strip_str(strip_str)
+            self.assertEqual(construct_strip_str(length, creases, mv_assignment), strip_str)
+            canonical_creases, canonical_assignment, is_reversed, is_complemented = \
+                get_canonical_strip(length, creases, mv_assignment)
+            canonical: Strip = get_strip_from_str(construct_strip_str(length, canonical_creases, canonical_assignment))
+            canonical.all_simple_folds()
+            strip: Strip = get_strip_from_str(strip_str)
+            strip.all_simple_folds()
+            self.assertEqual(derive_symmetric_layers(strip_str, canonical.get_db(), is_reversed, is_complemented),
+                             strip.get_db())
+
+    def test_split_layers(self):
+        strip: Strip = get_strip_from_str('1V1V1M1')
+        strip.all_simple_folds()
+        states, orders = split_layers(strip.get_db())
+        self.assertLess(len(states), len(orders))
+        self.assertEqual(join_states(states, orders), strip.get_db())
+
+    def test_order_sink(self):
+        strip: Strip = get_strip_from_str('1V1M2V1M1')
+        strip.all_simple_folds()
+        chunks: List = []
+        streamed: Strip = get_strip_from_str('1V1M2V1M1')
+        folded_creases: List[int] = []
+
+        def write(chunk):
+            chunks.append(chunk)
+            folded_creases.append(len(streamed.get_folded_order()))
+        sink: ChunkedOrderSink = ChunkedOrderSink(write, 4)
+        self.assertTrue(streamed.all_simple_folds(sink=sink))
+        sink.close()
+        self.assertEqual(streamed.get_db(), {})
+        # The orders are written during the search, while the strip is still folded
+        self.assertGreater(folded_creases[0], 0)
+        self.assertTrue(all(0 < len(chunk) <= 4 for chunk in chunks))
+        for chunk in chunks:
+            for order, layers in chunk:
+                streamed._add_strip_to_database(order, layers)
+        self.assertEqual(streamed.get_db(), strip.get_db())
+
+    def test_order_dag(self):
+        strip: Strip = get_strip_from_str('1V1M2V1M1')
+        strip.all_simple_folds()
+        states, orders = split_layers(strip.get_db())
+        dag, dag_states = get_strip_from_str('1V1M2V1M1').get_order_dag()
+        self.assertEqual(join_states(dict(enumerate(dag_states)), dag.get_orders()), strip.get_db())
+        self.assertEqual(dag.count_orders(), len(orders))
+        for crease in dag.get_next_creases():
+            prefix_orders: List[str] = [order for order in orders if order.split('|')[0] == str(crease)]
+            self.assertEqual(dag.count_orders([crease]), len(prefix_orders))
+            self.assertEqual(sorted('|'.join(map(str, order)) for order, _ in dag.get_completions([crease])),
+                             sorted(prefix_orders))
+        self.assertEqual(dag.count_orders([9]), 0)
+        decoded: OrderDag = decode_order_dag(dag.encode())
+        self.assertEqual(decoded.get_orders(), dag.get_orders())
+        uncached, _ = get_strip_from_str('1V1M2V1M1').get_order_dag(cache_size=0)
+        self.assertEqual(uncached.get_orders(), dag.get_orders())
+        self.assertEqual(uncached.get_node_amount(), dag.get_node_amount())
+        self.assertEqual(dag.minimize().get_node_amount(), dag.get_node_amount())
+
+    def test_order_dag_builder(self):
+        dag, dag_states = get_strip_from_str('1V1M2V1M1').get_order_dag()
+        builder: OrderDagBuilder = OrderDagBuilder()
+        for order, state_id in dag.get_completions():
+            builder.add(order, state_id)
+        built: OrderDag = builder.get_order_dag()
+        self.assertEqual(built.get_orders(), dag.get_orders())
+        self.assertEqual(built.get_node_amount(), dag.get_node_amount())
+        # Evicted states are searched again, the streamed graph does not depend on the cache size
+        for cache_size in [100000, 2, 0]:
+            sink: OrderDagSink = OrderDagSink()
+            self.assertTrue(get_strip_from_str('1V1M2V1M1').all_simple_folds(cache_size, sink))
+            streamed: OrderDag = sink.get_order_dag()
+            self.assertEqual(streamed.get_orders(), dag.get_orders())
+            self.assertEqual(streamed.get_node_amount(), dag.get_node_amount())
+            self.assertEqual(sink.get_states(), dag_states)
+        data, states, encoded = get_strip_row(get_strip_from_str('1V1M2V1M1'))
+        self.assertEqual(decode_order_dag(encoded).get_orders(), dag.get_orders())
+        self.assertEqual(states, [encode_state(state) for state in dag_states])
+        self.assertEqual(data[6], dag.count_orders())
+
+    def test_order_lattice(self):
+        order_dict = {'2M2': {'0', '1'}, '1M1': {'0', '1'}, '1M2': {'0'}, '2M1': {'0', '1'}, '1V1': {'1'}}
+        self.assertEqual(construct_order_lattice(order_dict),
+                         {'2M2': ['1M2', '2M1'], '1M1': [], '1M2': ['1M1'], '2M1': ['1M1'], '1V1': []})
+        order_dict['2M1'] = {'1'}
+        with self.assertRaises(ValueError):
+            construct_order_lattice(order_dict)
+
+    def test_layer_cycle(self):
+        in_degree: List[int] = [0] * 4
+        above: List[List[int]] = [[] for _ in range(4)]
+        self.assertFalse(has_layer_cycle({'0|0|0': '0|1|2', '1|0|0': '3|2'}, 4, in_degree, above))
+        self.assertTrue(has_layer_cycle({'0|0|0': '0|1', '1|0|0': '1|2', '2|0|0': '2|0'}, 3, in_degree, above))
+        self.assertFalse(has_layer_cycle({'0|0|0': '2|1|0'}, 3, in_degree, above))
+
+    def test_histogram(self):
+        x: np.ndarray = np.array([0, 0.5, 1, 1, 0.25])
+        y: np.ndarray = np.array([0, 3, 40, 7, 100])
+        histogram: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1), chunk_size=2)
+        for x_value, y_value in zip(x, y):
+            histogram.add(x_value, y_value)
+        x_edges, y_edges = histogram.get_edges()
+        self.assertEqual(y_edges[-1], 128)
+        self.assertTrue(np.array_equal(histogram.get_counts(), np.histogram2d(x, y, bins=(x_edges, y_edges))[0]))
+        merged: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+        merged.add_chunk(x[:2], y[:2])
+        other: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+        other.add_chunk(x[2:], y[2:])
+        merged.merge(other)
+        self.assertTrue(np.array_equal(merged.get_counts(), histogram.get_counts()))
+        with self.assertRaises(ValueError):
+            merged.add_chunk(np.array([0.5, np.nan]), np.array([1, 2]))
+        with self.assertRaises(ValueError):
+            merged.add(0.5, -1)
+            merged.flush()
+
+    def test_histogram_merge_widths(self):
+        x: np.ndarray = np.array([0, 0.5, 1, 1.5, 0.25, 1.75])
+        y: np.ndarray = np.array([1, 3, 7, 100, 250, 2])
+        expected: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+        expected.add_chunk(x, y)
+        # The y bins of the large values are three doublings wider than those of the small values
+        small: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+        small.add_chunk(x[[0, 1, 2, 5]], y[[0, 1, 2, 5]])
+        large: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+        large.add_chunk(x[[3, 4]], y[[3, 4]])
+        for first, second in [(small, large), (large, small)]:
+            merged: Histogram2D = Histogram2D((4, 8), (0, 0), (0.5, 1))
+            merged.merge(first)
+            merged.merge(second)
+            self.assertTrue(np.array_equal(merged.get_counts(), expected.get_counts()))
+            self.assertTrue(all(np.array_equal(a, b) for a, b in zip(merged.get_edges(), expected.get_edges())))
+
+    def test_histogram_save(self):
+        histogram: Histogram2D = Histogram2D((4, 8), (-0.25, 0), (0.5, 1))
+        histogram.add_chunk(np.array([0, 0.5, 1]), np.array([1, 30, 7]))
+        with tempfile.TemporaryDirectory() as directory:
+            histogram.save('histogram', directory)
+            loaded: Histogram2D = load_histogram('histogram', directory)
+        self.assertTrue(np.array_equal(loaded.get_counts(), histogram.get_counts()))
+        self.assertTrue(all(np.array_equal(a, b) for a, b in zip(loaded.get_edges(), histogram.get_edges())))
+
+    def test_strip_ids(self):
+        strip_ids: List[int] = []
+        for length in range(1, 7):
+            for creases in range(2 ** (length - 1)):
+                for mv_assignment in range(2 ** bin(creases).count('1')):
+                    strip_id: int = rank_strip(length, creases, mv_assignment)
+                    self.assertEqual(unrank_strip(strip_id), (length, creases, mv_assignment))
+                    self.assertTrue(get_length_offset(length) <= strip_id < get_length_offset(length + 1))
+                    strip_ids.append(strip_id)
+        self.assertEqual(sorted(strip_ids), list(range(get_length_offset(7))))
+
+    def test_encoding(self):
+        for rank, order in enumerate(permutations(range(4))):
+            self.assertEqual(rank_order(order), rank)
+            self.assertEqual(unrank_order(rank, 4), list(order))
+        for order in [[], [0], [3, 0, 2, 1], list(range(20))[::-1]]:
+            self.assertEqual(decode_order(encode_order(order)), order)
+        for state in [{}, {'0|0|1': '0|2|1', '-1|0|1': '1'}, {'300|-2|1': '200|0'}]:
+            self.assertEqual(decode_state(encode_state(state)), state)
+
     def test_simple_foldable_generator(self):
         amount_of_faces: int = 10
         max_face_length: int = 5
@@ -183,3 +450,287 @@ class VisualizationTests(unittest.TestCase):
 
     def test_stamp_folding(self):
         self.assertTrue(analyze_stamp_folding())
+
+
+class CountingAnalyzer(StripAnalyzer):
+    """
+    Counts the rows it consumes and stops after a limit.
+    """
+    def __init__(self, name: str, limit: Optional[int] = None):
+        super().__init__()
+        self.name = name
+        self._limit: Optional[int] = limit
+        self._count: int = 0
+
+    def consume(self, row: StripRow):
+        self._count += 1
+        if self._count == self._limit:
+            self.stop()
+
+    def merge(self, other: 'CountingAnalyzer'):
+        self._count += other._count
+
+    def finish(self) -> int:
+        return self._count
+
+
+class DatabaseTests(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._database_path: str = database_tools.DATABASE_PATH
+        database_tools.DATABASE_PATH = os.path.join(self._directory.name, 'database.db')
+
+    def tearDown(self):
+        database_tools.DATABASE_PATH = self._database_path
+        self._directory.cleanup()
+
+    def use_database(self, name: str):
+        database_tools.DATABASE_PATH = os.path.join(self._directory.name, name)
+
+    def get_database_rows(self) -> List[List[Tuple]]:
+        connection, cur = database_tools.open_database()
+        rows: List[List[Tuple]] = []
+        for query in ['SELECT strip_name, len, n_creases, M_creases, creases, crease_direction, layers, n_orders, '
+                      'n_states, n_faces, crease_type, max_layer_depth, orders_indexed FROM strips ORDER BY strip_name',
+                      'SELECT * FROM states ORDER BY strip_name, state_id',
+                      'SELECT * FROM order_dags ORDER BY strip_name',
+                      'SELECT * FROM order_strips ORDER BY fold_order, strip_id',
+                      'SELECT * FROM progress ORDER BY len, creases, symmetry_reduced']:
+            cur.execute(query)
+            rows.append(cur.fetchall())
+        connection.close()
+        return rows
+
+    def test_strip_writer(self):
+        connection, cur = database_tools.open_database()
+        rows = [get_strip_row(get_strip_from_str(strip_str)) for strip_str in ['1', '1M1', '1V1', '1M1M1']]
+        other = sqlite3.connect(database_tools.DATABASE_PATH)
+        writer: database_tools.StripWriter = database_tools.StripWriter(connection, batch_size=2)
+        self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        writer.add(rows[:1], [(1, 0, False)])
+        self.assertEqual(other.execute('SELECT COUNT(*) FROM strips').fetchone()[0], 0)
+        writer.add(rows[1:3], [(2, 1, False)])
+        self.assertEqual(other.execute('SELECT COUNT(*) FROM strips').fetchone()[0], 3)
+        self.assertEqual(database_tools.get_progress(other.cursor()), {(1, 0), (2, 1)})
+        # The secondary indexes are only created again when the load is done
+        index_query: str = "SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND name LIKE 'strips_%'"
+        self.assertEqual(other.execute(index_query).fetchone()[0], 1)
+        writer.add(rows[3:])
+        writer.close()
+        self.assertEqual(other.execute('SELECT COUNT(*) FROM strips').fetchone()[0], 4)
+        self.assertEqual(other.execute(index_query).fetchone()[0], len(database_tools.STRIP_INDEXES) + 1)
+
+    def test_parallel_calculation(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 5))
+        serial: List[List[Tuple]] = self.get_database_rows()
+        self.assertEqual(len(serial[0]), sum(3 ** (length - 1) for length in range(1, 6)))
+        self.use_database('parallel.db')
+        self.assertTrue(calculate_all_folds_strip_length(1, 5, workers=2, chunk_size=2, batch_size=7))
+        self.assertEqual(self.get_database_rows(), serial)
+
+    def test_old_format_statistics(self):
+        # Strips table as written before the statistics columns and the states and order graphs existed
+        connection = sqlite3.connect(database_tools.DATABASE_PATH)
+        connection.execute('CREATE TABLE strips (strip_name text, len INTEGER, n_creases INTEGER, M_creases INTEGER, '
+                           'creases INTEGER, crease_direction INTEGER, layers text)')
+        expected: Histogram2D = get_order_amount_histogram()
+        for strip_str in ['1V1M2V1M1', '1M1V1', '2V1']:
+            strip: Strip = get_strip_from_str(strip_str)
+            strip.all_simple_folds()
+            connection.execute('INSERT INTO strips VALUES(?, ?, ?, ?, ?, ?, ?)',
+                               (strip_str, strip.get_length(), strip.get_crease_amount(),
+                                strip.get_n_mountain_folds(), strip.get_original_creases(),
+                                strip.get_original_folds(), json.dumps(strip.get_db())))
+            if strip.get_crease_amount() > 1:
+                expected.add(bin(strip.get_original_folds()).count('1') / strip.get_crease_amount(),
+                             get_strip_from_str(strip_str).count_simple_folds())
+        connection.commit()
+        connection.close()
+        connection, cur = database_tools.open_database()
+        cur.execute(f'SELECT {", ".join(STRIP_COLUMNS)} FROM strips')
+        analyzer: OrderAmountAnalyzer = OrderAmountAnalyzer()
+        for values in cur.fetchall():
+            row: StripRow = StripRow(connection, values)
+            self.assertIsNone(row.get('n_orders'))
+            self.assertEqual(row.get_state_amount(), len(split_layers(row.get_layers())[0]))
+            if analyzer.accepts(row):
+                analyzer.consume(row)
+        directory: str = os.path.join(self._directory.name, 'histograms')
+        save = Histogram2D.save
+        with mock.patch.object(Histogram2D, 'save', lambda histogram, name: save(histogram, name, directory)), \
+                mock.patch('histogram.plt'), mock.patch('data_processing.plt'):
+            self.assertTrue(analyzer.finish())
+        self.assertEqual(load_histogram(analyzer.name, directory).get_counts().tolist(),
+                         expected.get_counts().tolist())
+
+    def test_remove_duplicate_strips(self):
+        # Strips table of an older run which inserted some strips twice
+        connection = sqlite3.connect(database_tools.DATABASE_PATH)
+        connection.execute('CREATE TABLE strips (strip_name text, len INTEGER, n_creases INTEGER, M_creases INTEGER, '
+                           'creases INTEGER, crease_direction INTEGER, layers text)')
+        connection.executemany('INSERT INTO strips(strip_name, len) VALUES(?, ?)',
+                               [('1M1', 2), ('1V1', 2), ('1M1', 2)])
+        connection.commit()
+        connection.close()
+        connection, cur = database_tools.open_database()
+        cur.execute('SELECT strip_name FROM strips ORDER BY rowid')
+        self.assertEqual(cur.fetchall(), [('1M1',), ('1V1',), ('1M1',)])
+        self.assertTrue(database_tools.remove_duplicate_strips(cur))
+        cur.execute('SELECT strip_name FROM strips ORDER BY rowid')
+        self.assertEqual(cur.fetchall(), [('1M1',), ('1V1',)])
+        self.assertFalse(database_tools.remove_duplicate_strips(cur))
+        connection.close()
+
+    def test_strip_row_decodes_once(self):
+        connection, cur = database_tools.open_database()
+        legacy: Strip = get_strip_from_str('1M1V1')
+        legacy.all_simple_folds()
+        strip: Strip = get_strip_from_str('1V1M2V1M1')
+        strip.all_simple_folds()
+        with connection:
+            database_tools.insert_strips([get_strip_row(get_strip_from_str('1V1M2V1M1'))], cur)
+            cur.execute('INSERT INTO strips(strip_name, n_creases, layers) VALUES(?, ?, ?)',
+                        ('1M1V1', 2, json.dumps(legacy.get_db())))
+        cur.execute(f'SELECT {", ".join(STRIP_COLUMNS)} FROM strips ORDER BY strip_name')
+        rows = cur.fetchall()
+        for values, expected in zip(rows, [legacy.get_db(), strip.get_db()]):
+            with mock.patch('analysis_pipeline.load_layers', wraps=database_tools.load_layers) as load_layers, \
+                    mock.patch('analysis_pipeline.load_states', wraps=database_tools.load_states) as load_states, \
+                    mock.patch('analysis_pipeline.load_order_states',
+                               wraps=database_tools.load_order_states) as load_order_states:
+                row: StripRow = StripRow(connection, values)
+                self.assertEqual(row.get_orders(), {order for order in split_layers(expected)[1] if order})
+                self.assertEqual(len(row.get_states()), len(split_layers(expected)[0]))
+                self.assertEqual(row.get_layers(), expected)
+                self.assertEqual(load_layers.call_count + load_states.call_count + load_order_states.call_count,
+                                 1 if values[1] is not None else 2)
+
+    def test_resume_calculation(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 5))
+        expected: List[List[Tuple]] = self.get_database_rows()
+        self.use_database('interrupted.db')
+        calculated: List[str] = []
+
+        def interrupted_strip_row(strip: Strip):
+            if len(calculated) == 44:
+                raise KeyboardInterrupt
+            calculated.append(strip.get_strip_string())
+            return get_strip_row(strip)
+        with mock.patch('data_processing.get_strip_row', interrupted_strip_row):
+            with self.assertRaises(KeyboardInterrupt):
+                calculate_all_folds_strip_length(1, 5, batch_size=5)
+        # Only complete lengths and creases are committed, together with their progress marker
+        connection, cur = database_tools.open_database()
+        cur.execute('SELECT strip_name FROM strips')
+        strips: List[Tuple[int, int, int]] = [parse_strip_str(strip_str) for strip_str, in cur.fetchall()]
+        done = database_tools.get_progress(cur)
+        self.assertEqual({(length, creases) for length, creases, _ in strips}, done)
+        self.assertEqual(len(strips), sum(2 ** bin(creases).count('1') for _, creases in done))
+        self.assertLess(len(strips), len(calculated))
+        connection.close()
+        self.assertTrue(calculate_all_folds_strip_length(1, 5, resume=True))
+        self.assertEqual(self.get_database_rows(), expected)
+
+    def test_resume_symmetry_reduced(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 5))
+        expected: List[List[Tuple]] = self.get_database_rows()
+        self.use_database('reduced.db')
+        self.assertTrue(calculate_all_folds_strip_length(1, 5, symmetry_reduced=True))
+        # The progress of a symmetry reduced run does not complete a run with all strips
+        self.assertTrue(calculate_all_folds_strip_length(1, 5, resume=True))
+        self.assertEqual(self.get_database_rows()[:4], expected[:4])
+
+    def test_analyses_early_stop(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 5))
+        n_strips: int = sum(3 ** (length - 1) for length in range(1, 6))
+        self.assertEqual(run_analyses([CountingAnalyzer('stopped', 3), CountingAnalyzer('all')], fetch_size=2,
+                                      timing=False), {'stopped': 3, 'all': n_strips})
+        # The scan ends when all analyzers stopped
+        with mock.patch('analysis_pipeline.StripRow', wraps=StripRow) as strip_row:
+            self.assertEqual(run_analyses([CountingAnalyzer('stopped', 3)], fetch_size=2, timing=False),
+                             {'stopped': 3})
+        self.assertEqual(strip_row.call_count, 3)
+
+    def test_sharded_analyses_stop(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 6))
+        n_strips: int = sum(3 ** (length - 1) for length in range(1, 7))
+        results = run_analyses([CountingAnalyzer('stopped', 1), CountingAnalyzer('all')], fetch_size=1,
+                               timing=False, workers=2, shards=8)
+        self.assertEqual(results['all'], n_strips)
+        # A stop in one shard stops the analyzer in every shard, only shards which were already scanning
+        # concurrently can feed it another row
+        self.assertLessEqual(results['stopped'], 2)
+
+    def test_strip_index(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 4, symmetry_reduced=True))
+        index: StripIndex = build_strip_index(4, os.path.join(self._directory.name, 'strip_index.npy'))
+        self.assertEqual(len(index), get_length_offset(5))
+        self.assertEqual(index.get_max_length(), 4)
+        connection, cur = database_tools.open_database()
+        cur.execute('SELECT rowid, strip_name, len, n_orders, n_states, max_layer_depth FROM strips')
+        rows = cur.fetchall()
+        for rowid, strip_name, length, n_orders, n_states, max_layer_depth in rows:
+            self.assertEqual(index.get_rowid(strip_name), rowid)
+            record = index.get_strip(strip_name)
+            self.assertEqual((int(record['n_orders']), int(record['n_states']), int(record['max_layer_depth'])),
+                             (n_orders, n_states, max_layer_depth))
+            self.assertEqual(index.get(rank_strip(*parse_strip_str(strip_name))), record)
+        self.assertEqual(sum(int(np.count_nonzero(index.get_length(length)['rowid'] >= 0)) for length in range(1, 5)),
+                         len(rows))
+        # Strips which are not representatives of their symmetry class are derived from their representative
+        strip_strs: List[str] = [construct_strip_str(length, creases, mv_assignment) for length in range(1, 5)
+                                 for creases in range(2 ** (length - 1))
+                                 for mv_assignment in range(2 ** bin(creases).count('1'))]
+        expected = {strip_str: get_strip_layers(cur, strip_str) for strip_str in strip_strs}
+        self.assertEqual({strip_str: get_strip_layers(cur, strip_str, index) for strip_str in strip_strs}, expected)
+        # A replaced strip gets a new rowid, here the rowid of the deleted last row, the index is then stale
+        deleted: str = max(rows)[1]
+        with connection:
+            cur.execute('DELETE FROM strips WHERE strip_name=?', (deleted,))
+            database_tools.insert_strips([get_strip_row(get_strip_from_str(rows[0][1]))], cur)
+        cur.execute('SELECT strip_name FROM strips WHERE rowid=?', (index.get_rowid(deleted),))
+        self.assertEqual(cur.fetchone(), (rows[0][1],))
+        expected = {strip_str: get_strip_layers(cur, strip_str) for strip_str in strip_strs}
+        self.assertIsNone(expected[deleted])
+        self.assertEqual({strip_str: get_strip_layers(cur, strip_str, index) for strip_str in strip_strs}, expected)
+        connection.close()
+
+    def test_export_columns(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 4, symmetry_reduced=True))
+        directory: str = os.path.join(self._directory.name, 'columns')
+        columns = export_columns(directory=directory)
+        loaded = load_columns(directory)
+        self.assertEqual(set(columns), set(EXPORTED_COLUMNS))
+        self.assertTrue(all(np.array_equal(columns[column], loaded[column]) for column in EXPORTED_COLUMNS))
+        self.assertEqual(len(loaded['len']), get_length_offset(5))
+        connection, cur = database_tools.open_database()
+        cur.execute(f'SELECT strip_name, {", ".join(EXPORTED_COLUMNS)} FROM strips')
+        rows = cur.fetchall()
+        for row in rows:
+            strip_id: int = rank_strip(*parse_strip_str(row[0]))
+            self.assertEqual([int(loaded[column][strip_id]) for column in EXPORTED_COLUMNS], list(row[1:]))
+        # The strips which are not representatives of their symmetry class are not in the database
+        self.assertEqual(int(np.count_nonzero(loaded['len'] >= 0)), len(rows))
+        self.assertTrue(np.all(loaded['n_orders'][loaded['len'] < 0] == -1))
+
+    def test_order_index(self):
+        self.assertTrue(calculate_all_folds_strip_length(1, 5))
+        connection, cur = database_tools.open_database()
+        cur.execute('SELECT strip_name, layers FROM strips')
+        strip_orders = {rank_strip(*parse_strip_str(strip_name)):
+                        database_tools.load_orders(connection, strip_name, layers)
+                        for strip_name, layers in cur.fetchall()}
+        self.assertEqual(database_tools.get_indexed_orders(cur, list(strip_orders)), strip_orders)
+        strip_ids: List[int] = [rank_strip(*parse_strip_str(strip_str)) for strip_str in ['1V1M1V1', '1V1V1V1']]
+        self.assertEqual(database_tools.get_common_orders(cur, strip_ids),
+                         strip_orders[strip_ids[0]] & strip_orders[strip_ids[1]])
+        # A replaced strip has to be indexed again before the index is used
+        with connection:
+            database_tools.insert_strips([get_strip_row(get_strip_from_str('1V1M1V1'))], cur)
+        cur.execute('SELECT strip_name FROM strips WHERE orders_indexed IS NULL')
+        self.assertEqual(cur.fetchall(), [('1V1M1V1',)])
+        self.assertTrue(build_order_index())
+        cur.execute('SELECT COUNT(*) FROM strips WHERE orders_indexed IS NULL')
+        self.assertEqual(cur.fetchone()[0], 0)
+        self.assertEqual(database_tools.get_indexed_orders(cur, strip_ids[:1]),
+                         {strip_ids[0]: strip_orders[strip_ids[0]]})